@@ -4,19 +4,31 @@ import React, { useEffect, useState, useRef } from 'react';
 import { motion, useAnimation, useInView } from 'framer-motion';
 
 // Interfaces for our strictly-typed frontend
+// Fields of the server's "carousel" view (see apps/serializers.py)
 export interface DiscountProduct {
     id: number;
     name: string;
     description: string;
     price: number;
-    discount_price: number | null;
-    is_discount: boolean;
+    old_price: number | null;
+    effective_price: number;
     image: string;
-    brand: string;
-    stock: number;
-    rating: number;
-    rating_count: number;
-    tag: string;
+}
+
+// Strike-through price: the reference price the sale is measured against
+const referencePrice = (p: DiscountProduct) => p.old_price ?? p.price;
+
+// Columnar listing: one array per field, all of the same length
+type Columns<T> = { [K in keyof T]: T[K][] };
+
+function fromColumns<T>(columns: Columns<T>): T[] {
+    const keys = Object.keys(columns) as (keyof T)[];
+    const length = keys.length ? columns[keys[0]].length : 0;
+    return Array.from({ length }, (_, i) => {
+        const row = {} as T;
+        for (const key of keys) row[key] = columns[key][i];
+        return row;
+    });
 }
 
 export default function DiscountCarousel() {
@@ -32,11 +44,11 @@ export default function DiscountCarousel() {
         // Phase 2 sync: Fetch from the newly created Flask endpoint
         const fetchDiscountProducts = async () => {
             try {
-                const res = await fetch('/api/products/sale');
+                const res = await fetch('/api/products/sale?view=carousel&format=columnar');
                 if (!res.ok) throw new Error('Network response was not ok');
                 const data = await res.json();
                 if (data.success && data.products) {
-                    setProducts(data.products);
+                    setProducts(fromColumns<DiscountProduct>(data.products));
                 }
             } catch (error) {
                 console.error("Failed to fetch products:", error);
@@ -127,7 +139,7 @@ export default function DiscountCarousel() {
                         >
                             <div className="flex justify-between items-start">
                                 <span className="px-3 py-1 text-xs font-semibold uppercase tracking-wider text-red-600 bg-red-100 rounded-full">
-                                    Save ${(product.price - (product.discount_price || 0)).toFixed(0)}
+                                    Save ${(referencePrice(product) - product.effective_price).toFixed(0)}
                                 </span>
                                 <button className="text-gray-400 hover:text-red-500 transition-colors">
                                     <svg width="22" height="22" fill="none" viewBox="0 0 24 24" stroke="currentColor" strokeWidth="2">
@@ -156,10 +168,10 @@ export default function DiscountCarousel() {
 
                                 <div className="flex items-center gap-3 mt-2">
                                     <span className="text-2xl font-bold tracking-tight text-gray-900">
-                                        ${product.discount_price ? product.discount_price.toFixed(2) : product.price.toFixed(2)}
+                                        ${product.effective_price.toFixed(2)}
                                     </span>
                                     <span className="text-sm text-gray-400 line-through">
-                                        ${product.price.toFixed(2)}
+                                        ${referencePrice(product).toFixed(2)}
                                     </span>
                                 </div>
 
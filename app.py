@@ -1,12 +1,41 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 from flask import Flask, jsonify
-from flask_login import LoginManager
 from dotenv import load_dotenv
 
 # Load environment variables early
 load_dotenv()
 
+_IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+
+
+class StartupTimer:
+    """Wall-clock time per factory phase, in ms, kept in app.extensions['startup']."""
+
+    def __init__(self):
+        self.phases = {'imports': round(_IMPORT_MS, 2)}
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000, 2)
+        self._last = now
+
+    def add(self, phase, ms):
+        self.phases[phase] = round(ms, 2)
+
+    def report(self):
+        total = sum(self.phases.values())
+        parts = ', '.join(f'{k} {v:.0f}' for k, v in self.phases.items())
+        return f'{total:.0f}ms ({parts})'
+
+
 def create_app():
+    import click
+    timer = StartupTimer()
     app = Flask(__name__)
 
     # ── Environment Stability / Configuration ──────────────────────────────────
@@ -14,31 +43,124 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'change-me-in-production-abc123xyz')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///promarket.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection profile (see apps/database.py): SQLite pragmas and read pool,
+    # or pool sizing for server databases
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_READ_POOL'] = os.environ.get('SQLITE_READ_POOL', '1') == '1'
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # Read replicas for GET requests (comma-separated URLs), health checks and
+    # how long a client stays on the primary after writing
+    app.config['DATABASE_REPLICA_URLS'] = os.environ.get('DATABASE_REPLICA_URLS', '')
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 10))
+    app.config['DB_STICKY_SECONDS'] = float(os.environ.get('DB_STICKY_SECONDS', 5))
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    # Catalog read cache (see apps/cache.py)
+    app.config['CATALOG_CACHE_TTL'] = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+    app.config['CATALOG_CACHE_SIZE'] = int(os.environ.get('CATALOG_CACHE_SIZE', 256))
+    # Conditional GET / CDN caching for the public JSON API (see apps/http_cache.py)
+    app.config['API_CACHE_MAX_AGE'] = int(os.environ.get('API_CACHE_MAX_AGE', 30))
+    app.config['API_CACHE_S_MAXAGE'] = int(os.environ.get('API_CACHE_S_MAXAGE', 60))
+    app.config['API_CACHE_SWR'] = int(os.environ.get('API_CACHE_SWR', 30))
+    # Per-request query budget, enforced in debug/test runs (see apps/query_budget.py)
+    app.config['QUERY_BUDGET'] = int(os.environ.get('QUERY_BUDGET', 10))
+    # Admin dashboard (see apps/stats.py)
+    app.config['LOW_STOCK_THRESHOLD'] = int(os.environ.get('LOW_STOCK_THRESHOLD', 5))
+    app.config['STATS_REVENUE_DAYS'] = int(os.environ.get('STATS_REVENUE_DAYS', 30))
+    # Signed-in user snapshots cached per worker (see apps/user_cache.py)
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    # Guest carts idle this long are deleted by `flask cart-purge` (see apps/cart.py)
+    app.config['CART_TTL_DAYS'] = int(os.environ.get('CART_TTL_DAYS', 30))
+    app.config['CART_PURGE_CHUNK'] = int(os.environ.get('CART_PURGE_CHUNK', 5000))
+    # Home page inlines the UI config and renders the category bar (see apps/main.py)
+    app.config['SSR_INITIAL_STATE'] = os.environ.get('SSR_INITIAL_STATE', '1') == '1'
+    # Response compression (see apps/compression.py)
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_BR_QUALITY'] = int(os.environ.get('COMPRESS_BR_QUALITY', 5))
+    if os.environ.get('COMPRESS_MIMETYPES'):
+        app.config['COMPRESS_MIMETYPES'] = tuple(
+            m.strip() for m in os.environ['COMPRESS_MIMETYPES'].split(',') if m.strip())
+    # Hashed bundles from `flask build-assets` (see apps/assets.py); debug
+    # servers use the source files unless ASSETS_USE_MANIFEST=1
+    if 'ASSETS_USE_MANIFEST' in os.environ:
+        app.config['ASSETS_USE_MANIFEST'] = os.environ['ASSETS_USE_MANIFEST'] == '1'
+    # Login brute-force limiter: sqlite (shared side file), memory or database
+    app.config['LOGIN_LIMITER_BACKEND'] = os.environ.get('LOGIN_LIMITER_BACKEND', 'sqlite')
+    # Schema/seed bootstrap runs once per deploy (bootstrap.py); only dev servers
+    # do it on startup, so workers boot without touching the database
+    app.config['AUTO_BOOTSTRAP'] = os.environ.get('AUTO_BOOTSTRAP', '1' if app.debug else '0') == '1'
+    app.config['STARTUP_REPORT'] = os.environ.get('STARTUP_REPORT', '1' if app.debug else '0') == '1'
+    timer.mark('config')
 
     # ── Database & Circular Import Fixes ───────────────────────────────────────
     # Import db and models inside the factory to avoid circular imports
     try:
-        from models import db, User
+        from models import db
+        from apps.database import configure_database, init_database
+        configure_database(app)
         db.init_app(app)
+        init_database(app, db)
     except ImportError as e:
         print(f"Error importing models: {e}")
         return app
 
     # ── Flask-Login ────────────────────────────────────────────────────────────
+    from flask_login import LoginManager
     login_manager = LoginManager()
     login_manager.init_app(app)
+    from apps.user_cache import init_user_cache, load_user_snapshot
+    init_user_cache(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        # Modernized User Loader using db.session.get()
-        return db.session.get(User, int(user_id))
+        # Cached identity snapshot, not the full row (see apps/user_cache.py)
+        return load_user_snapshot(user_id)
 
     @login_manager.unauthorized_handler
     def unauthorized():
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
 
+    timer.mark('models')
+
+    # ── Catalog Read Cache ─────────────────────────────────────────────────────
+    from apps.cache import init_cache
+    init_cache(app)
+
+    # ── Dashboard Statistics (registers the counter hooks) ────────────────────
+    from apps.stats import init_stats
+    init_stats(app)
+
+    # ── Pricing (registers the effective-price hooks on Product) ───────────────
+    import apps.pricing  # noqa: F401
+
+    # ── Login Rate Limiter ─────────────────────────────────────────────────────
+    from apps.ratelimit import init_limiter
+    from apps.auth import MAX_ATTEMPTS, LOCKOUT_MINUTES
+    init_limiter(app, MAX_ATTEMPTS, LOCKOUT_MINUTES)
+
+    # ── Query Budget (debug/test only) ─────────────────────────────────────────
+    from apps.query_budget import init_query_budget
+    init_query_budget(app)
+
+    # ── Static Asset Manifest ──────────────────────────────────────────────────
+    from apps.assets import init_assets
+    init_assets(app)
+
+    # ── Response Compression ───────────────────────────────────────────────────
+    from apps.compression import init_compression
+    init_compression(app)
+    timer.mark('extensions')
+
     # ── Complete Blueprint Integration ─────────────────────────────────────────
     try:
         from apps.main import main_bp
@@ -50,6 +172,7 @@ def create_app():
         app.register_blueprint(admin_bp, url_prefix='/admin')
     except ImportError as e:
         print(f"Error importing or registering blueprints: {e}")
+    timer.mark('blueprints')
 
     # ── Security Headers ───────────────────────────────────────────────────────
     @app.after_request
@@ -70,18 +193,17 @@ def create_app():
         )
         return response
 
-    # ── Database Initialization & Seeding Logic ────────────────────────────────
-    with app.app_context():
-        db.create_all()
-
-        # Auto-seed only if the database (User table) is truly empty
+    # ── Database Bootstrap (dev only; see bootstrap.py) ────────────────────────
+    if app.config['AUTO_BOOTSTRAP']:
+        from bootstrap import run_bootstrap
         try:
-            if db.session.query(User).first() is None:
-                from seed import run_seed
-                run_seed()
-                print('[App] Auto-seeded database on first run.')
+            timer.add('database', run_bootstrap(app))
         except Exception as e:
-            print(f'[App] Seed error during initialization: {e}')
+            print(f'[App] Bootstrap error during initialization: {e}')
+
+    app.extensions['startup'] = timer.phases
+    if app.config['STARTUP_REPORT']:
+        print(f'[App] Startup {timer.report()}')
 
     # ── CLI Commands ───────────────────────────────────────────────────────────
     @app.cli.command('seed')
@@ -95,6 +217,162 @@ def create_app():
         except Exception as e:
             print(f"Error seeding database: {e}")
 
+    @app.cli.command('bootstrap')
+    @click.option('--no-seed', is_flag=True, help='Do not seed an empty database.')
+    def bootstrap_cmd(no_seed):
+        """Create/upgrade the schema, search index and prices; seed if empty."""
+        from bootstrap import run_bootstrap
+        elapsed = run_bootstrap(app, seed=not no_seed)
+        print(f'Bootstrap done in {elapsed:.0f}ms.')
+
+    @app.cli.command('startup-report')
+    def startup_report_cmd():
+        """Show how long this app took to start, by phase."""
+        for phase, ms in app.extensions['startup'].items():
+            print(f'{phase:<12} {ms:>9.2f} ms')
+        print(f'{"total":<12} {sum(app.extensions["startup"].values()):>9.2f} ms')
+
+    @app.cli.command('search-reindex')
+    def search_reindex_cmd():
+        """Rebuild the product full-text search index."""
+        from apps.search import rebuild_index, fts_enabled
+        with app.app_context():
+            if not fts_enabled():
+                print('Full-text index not available on this database; nothing to do.')
+                return
+            rebuild_index()
+            print('Search index rebuilt.')
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade_cmd():
+        """Create missing tables, columns and indexes on an existing database."""
+        from models.schema import upgrade_schema
+        with app.app_context():
+            added, created = upgrade_schema()
+            for name in added:
+                print(f'Added column {name}')
+            for name in created:
+                print(f'Created index {name}')
+            print(f'{len(added)} column(s) added, {len(created)} index(es) created.')
+
+    @app.cli.command('db-indexes')
+    @click.option('--check', is_flag=True,
+                  help='EXPLAIN the hot queries and fail if any falls back to a full scan.')
+    def db_indexes_cmd(check):
+        """Create missing indexes on an existing database."""
+        from models.schema import ensure_indexes, explain_hot_queries
+        with app.app_context():
+            created = ensure_indexes()
+            for name in created:
+                print(f'Created index {name}')
+            print(f'{len(created)} index(es) created.')
+
+            if not check:
+                return
+            failed = 0
+            for name, plan, problems in explain_hot_queries():
+                status = 'FAIL' if problems else 'ok'
+                print(f'[{status}] {name}: {"; ".join(plan)}')
+                failed += bool(problems)
+            if failed:
+                print(f'{failed} hot query(ies) not index-backed.')
+                sys.exit(1)
+
+    @app.cli.command('import-catalog')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--kind', type=click.Choice(['products', 'categories']), default='products')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+                  help='Defaults to the file extension.')
+    def import_catalog_cmd(path, kind, fmt):
+        """Bulk upsert products or categories from a CSV/JSONL file."""
+        from apps.catalog_io import detect_format, import_catalog
+        fmt = fmt or detect_format(path)
+        if not fmt:
+            print('Cannot tell the format from the file name; pass --format.')
+            sys.exit(2)
+        with app.app_context(), open(path, encoding='utf-8-sig', newline='') as f:
+            result = import_catalog(f, kind, fmt)
+        for err in result['errors']:
+            print(f'line {err["line"]}: {err["error"]}')
+        print(f'{result["created"]} created, {result["updated"]} updated, '
+              f'{result["failed"]} failed.')
+        if result['failed']:
+            sys.exit(1)
+
+    @app.cli.command('export-catalog')
+    @click.option('--kind', type=click.Choice(['products', 'categories']), default='products')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv')
+    @click.option('--include-deleted', is_flag=True)
+    @click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-')
+    def export_catalog_cmd(kind, fmt, include_deleted, output):
+        """Stream products or categories as CSV/JSONL (stdout by default)."""
+        from apps.catalog_io import export_catalog
+        with app.app_context():
+            for chunk in export_catalog(kind, fmt, include_deleted):
+                output.write(chunk)
+
+    @app.cli.command('reprice')
+    def reprice_cmd():
+        """Re-evaluate effective prices (promotion windows). Run from cron."""
+        from apps.pricing import reprice_products
+        with app.app_context():
+            changed = reprice_products()
+            print(f'{changed} product price(s) updated.')
+
+    @app.cli.command('stats-recount')
+    def stats_recount_cmd():
+        """Rebuild the dashboard counters from the source tables. Run from cron."""
+        from apps.stats import recount_stats
+        with app.app_context():
+            drifted = recount_stats()
+            print(f'Dashboard counters rebuilt; {len(drifted)} had drifted.')
+
+    @app.cli.command('stats-compact')
+    def stats_compact_cmd():
+        """Fold pending counter deltas into the dashboard counters. Run from cron."""
+        from apps.stats import compact_stats
+        with app.app_context():
+            folded = compact_stats()
+            print(f'{folded} counter delta(s) folded.')
+
+    @app.cli.command('cart-purge')
+    @click.option('--days', type=int, default=None, help='TTL in days (default CART_TTL_DAYS).')
+    @click.option('--chunk', type=int, default=None, help='Rows per transaction.')
+    @click.option('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+    def cart_purge_cmd(days, chunk, pause):
+        """Delete expired guest cart lines in small batches. Run from cron."""
+        from apps.cart import purge_guest_carts
+        with app.app_context():
+            deleted = purge_guest_carts(days, chunk, pause)
+            print(f'{deleted} expired guest cart line(s) deleted.')
+
+    @app.cli.command('db-replicas')
+    def db_replicas_cmd():
+        """Probe the configured read replicas and print their health."""
+        from models.session import ROUTER_KEY
+        router = app.extensions.get(ROUTER_KEY)
+        if router is None:
+            print('No read replicas configured (DATABASE_REPLICA_URLS).')
+            return
+        with app.app_context():
+            engines = db.engines
+            for key in router.keys:
+                state = 'healthy' if router.healthy(key, engines[key]) else 'UNAVAILABLE'
+                print(f'{key}: {engines[key].url.render_as_string(hide_password=True)} {state}')
+
+    @app.cli.command('build-assets')
+    def build_assets_cmd():
+        """Bundle, minify, fingerprint and pre-compress static CSS/JS. Run at deploy."""
+        from apps.assets import build_assets
+        for row in build_assets(app.static_folder):
+            if row['file'] is None:
+                print(f"{row['name']}: skipped, empty after minifying")
+                continue
+            sizes = ', '.join(f'{ext} {row[ext]}' for ext in ('gz', 'br') if ext in row)
+            print(f"{row['file']}: {row['source']} -> {row['minified']} bytes"
+                  + (f' ({sizes})' if sizes else ''))
+        print('Manifest written; restart workers to pick it up.')
+
     @app.cli.command('create-admin')
     def create_admin_cmd():
         """Create an admin user interactively."""
@@ -118,5 +396,7 @@ def create_app():
 
 
 if __name__ == '__main__':
+    # The dev server prepares its own database; deploys run bootstrap.py instead
+    os.environ.setdefault('AUTO_BOOTSTRAP', '1')
     app = create_app()
     app.run(debug=True)
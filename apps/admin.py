@@ -1,18 +1,32 @@
-from flask import Blueprint, jsonify, request
+import io
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
-from models import db, Product, Category, BannerSlide, UIAsset, Order, User
+from models import db, Product, Category, BannerSlide, UIAsset, Order, ORDER_WITH_LINES
 from functools import wraps
+from datetime import datetime
+from apps.pagination import paginate_listing
+from apps.query_budget import query_budget
+from apps.stats import dashboard_response
+from apps.pricing import naive_utc
+from apps.user_cache import load_full_user
 import html
 
 admin_bp = Blueprint('admin', __name__)
 
 
 def admin_required(f):
-    """Decorator: require authenticated admin user."""
+    """Decorator: require authenticated admin user.
+
+    The cached identity rules out most callers; admins are then confirmed
+    against the database row, so a demotion takes effect immediately.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         if not current_user.is_authenticated or not current_user.is_admin:
             return jsonify({'success': False, 'message': 'Admin access required'}), 403
+        user = load_full_user()
+        if user is None or not user.is_admin:
+            return jsonify({'success': False, 'message': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated
 
@@ -24,22 +38,17 @@ def _s(val):
     return html.escape(str(val).strip())
 
 
+def _dt(val):
+    """Parse an ISO-8601 datetime (promotion windows) as naive UTC; empty means unset."""
+    return naive_utc(datetime.fromisoformat(val)) if val else None
+
+
 # ─── Dashboard Stats ──────────────────────────────────────────────────────────
 @admin_bp.route('/stats', methods=['GET'])
 @login_required
 @admin_required
 def stats():
-    return jsonify({
-        'success': True,
-        'stats': {
-            'products': Product.query.filter_by(is_deleted=False).count(),
-            'categories': Category.query.filter_by(is_active=True).count(),
-            'orders': Order.query.count(),
-            'users': User.query.count(),
-            'banners': BannerSlide.query.filter_by(is_active=True).count(),
-            'ui_assets': UIAsset.query.count(),
-        }
-    })
+    return dashboard_response()
 
 
 # ─── Products CRUD ────────────────────────────────────────────────────────────
@@ -47,16 +56,12 @@ def stats():
 @login_required
 @admin_required
 def list_products():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    products = Product.query.filter_by(is_deleted=False).order_by(
-        Product.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    q = Product.query.filter_by(is_deleted=False)
+    products, meta = paginate_listing(q, 'newest', default_per_page=20)
     return jsonify({
         'success': True,
-        'products': [p.to_dict() for p in products.items],
-        'total': products.total,
-        'pages': products.pages,
-        'page': page,
+        'products': [p.to_dict() for p in products],
+        **meta,
     })
 
 
@@ -74,11 +79,16 @@ def create_product():
         return jsonify({'success': False, 'message': 'Name and price required'}), 400
 
     product = Product(
+        sku=_s(data.get('sku')) or None,
         name=name,
         description=_s(data.get('description')),
         price=float(price),
         old_price=float(data['old_price']) if data.get('old_price') else None,
         discount=float(data.get('discount', 0)),
+        is_discount=bool(data.get('is_discount', False)),
+        discount_price=float(data['discount_price']) if data.get('discount_price') else None,
+        discount_starts_at=_dt(data.get('discount_starts_at')),
+        discount_ends_at=_dt(data.get('discount_ends_at')),
         image=_s(data.get('image')),
         brand=_s(data.get('brand')),
         stock=int(data.get('stock', 10)),
@@ -100,6 +110,8 @@ def update_product(pid):
     product = Product.query.get_or_404(pid)
     data = request.get_json() or {}
 
+    if 'sku' in data:
+        product.sku = _s(data['sku']) or None
     if 'name' in data:
         product.name = _s(data['name'])
     if 'description' in data:
@@ -110,6 +122,14 @@ def update_product(pid):
         product.old_price = float(data['old_price']) if data['old_price'] else None
     if 'discount' in data:
         product.discount = float(data['discount'])
+    if 'is_discount' in data:
+        product.is_discount = bool(data['is_discount'])
+    if 'discount_price' in data:
+        product.discount_price = float(data['discount_price']) if data['discount_price'] else None
+    if 'discount_starts_at' in data:
+        product.discount_starts_at = _dt(data['discount_starts_at'])
+    if 'discount_ends_at' in data:
+        product.discount_ends_at = _dt(data['discount_ends_at'])
     if 'image' in data:
         product.image = _s(data['image'])
     if 'brand' in data:
@@ -286,16 +306,13 @@ def update_ui_assets():
     data = request.get_json() or {}
     updates = data.get('updates', [])
 
+    values = {item.get('key'): item.get('value') for item in updates if item.get('key')}
+    assets = UIAsset.query.filter(UIAsset.key.in_(values)).all() if values else []
+
     updated = 0
-    for item in updates:
-        key = item.get('key')
-        value = item.get('value')
-        if not key:
-            continue
-        asset = UIAsset.query.filter_by(key=key).first()
-        if asset:
-            asset.value = value  # intentionally not escaping image URLs
-            updated += 1
+    for asset in assets:
+        asset.value = values[asset.key]  # intentionally not escaping image URLs
+        updated += 1
 
     db.session.commit()
     return jsonify({'success': True, 'updated': updated})
@@ -325,14 +342,62 @@ def patch_ui_asset(id):
     return jsonify({'success': True, 'asset': asset.to_dict()})
 
 
+# ─── Catalog Import / Export ─────────────────────────────────────────────────
+# The import/export modules load on first use; storefront workers never need them
+@admin_bp.route('/catalog/import', methods=['POST'])
+@login_required
+@admin_required
+@query_budget(None)
+def import_catalog_route():
+    """Bulk upsert products or categories from a CSV/JSONL upload or raw body."""
+    from apps.catalog_io import CatalogImportError, detect_format, import_catalog
+    kind = request.args.get('kind', 'products')
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    fmt = request.args.get('format') or detect_format(
+        upload.filename if upload else '', upload.mimetype if upload else request.mimetype)
+    if not fmt:
+        return jsonify({'success': False, 'message': 'Specify format=csv or format=jsonl'}), 400
+    try:
+        result = import_catalog(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''),
+                                kind, fmt)
+    except CatalogImportError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, **result})
+
+
+@admin_bp.route('/catalog/export', methods=['GET'])
+@login_required
+@admin_required
+@query_budget(None)
+def export_catalog_route():
+    from apps.catalog_io import CatalogImportError, export_catalog
+    kind = request.args.get('kind', 'products')
+    fmt = request.args.get('format', 'csv')
+    include_deleted = bool(request.args.get('include_deleted', type=int))
+    try:
+        chunks = export_catalog(kind, fmt, include_deleted)
+        first = next(chunks, '')
+    except CatalogImportError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    def generate():
+        yield first
+        yield from chunks
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
+
+
 # ─── Orders ───────────────────────────────────────────────────────────────────
 @admin_bp.route('/orders', methods=['GET'])
 @login_required
 @admin_required
 def list_orders():
     page = request.args.get('page', 1, type=int)
-    orders = Order.query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    orders = Order.query.options(*ORDER_WITH_LINES).order_by(
+        Order.created_at.desc()).paginate(page=page, per_page=20, error_out=False)
     return jsonify({
         'success': True,
         'orders': [o.to_dict() for o in orders.items],
@@ -341,16 +406,40 @@ def list_orders():
     })
 
 
+@admin_bp.route('/orders/export', methods=['GET'])
+@login_required
+@admin_required
+@query_budget(None)
+def export_orders_route():
+    """Stream orders as CSV (one row per line) or NDJSON, filtered by date and status."""
+    from apps.order_export import InvalidExportFilter, export_orders
+    fmt = request.args.get('format', 'csv')
+    try:
+        chunks = export_orders(fmt, request.args.get('from'), request.args.get('to'),
+                               request.args.get('status'))
+        first = next(chunks, '')
+    except InvalidExportFilter as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    def generate():
+        yield first
+        yield from chunks
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=orders.{fmt}'})
+
+
 @admin_bp.route('/orders/<int:oid>', methods=['PUT'])
 @login_required
 @admin_required
 def update_order_status(oid):
-    order = Order.query.get_or_404(oid)
+    from apps.order_export import ORDER_STATUSES
+    order = Order.query.options(*ORDER_WITH_LINES).filter_by(id=oid).first_or_404()
     data = request.get_json() or {}
     status = data.get('status')
-    valid = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
-    if status not in valid:
-        return jsonify({'success': False, 'message': f'Invalid status. Use: {valid}'}), 400
+    if status not in ORDER_STATUSES:
+        return jsonify({'success': False, 'message': f'Invalid status. Use: {ORDER_STATUSES}'}), 400
     order.status = status
     db.session.commit()
     return jsonify({'success': True, 'order': order.to_dict()})
@@ -360,6 +449,7 @@ def update_order_status(oid):
 @admin_bp.route('/seed', methods=['POST'])
 @login_required
 @admin_required
+@query_budget(None)
 def seed_database():
     """Seed demo products, categories, banners, and UI assets."""
     from seed import run_seed
@@ -0,0 +1,306 @@
+"""
+Static asset pipeline.
+
+``flask build-assets`` concatenates the page's stylesheets and scripts into
+bundles and minifies them. It then content-hashes every output file name,
+writes ``static/dist/manifest.json`` and stores gzip (and, when the optional
+``brotli`` package is installed, brotli) variants next to each file.
+
+Templates call ``asset_urls('css/app.css')``. With a manifest this yields the
+hashed bundle, served from ``/assets/`` with far-future immutable caching and
+the best pre-compressed variant the client accepts. Without one (development,
+or no build yet) it yields the individual source files through the normal
+static route. That is also the default in debug mode, so source edits show
+up without rebuilding.
+
+The minifiers are deliberately conservative: comments and redundant
+whitespace only, never renaming or reordering. Compression does the rest.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants are always written
+    brotli = None
+
+EXT_KEY = 'assets'
+
+# Bundle name -> sources (relative to static/), in page order
+BUNDLES = {
+    'css/app.css': ['css/main.css', 'css/components.css'],
+    'js/app.js': ['js/cart.js', 'js/auth.js', 'js/admin.js', 'js/ui-effects.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+# ─── Minifiers ────────────────────────────────────────────────────────────────
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+# Strings are matched first, so comment markers inside them are left alone
+_CSS_STRING_OR_COMMENT = re.compile(_CSS_STRING.pattern + r'|/\*.*?\*/', re.S)
+
+
+def minify_css(src):
+    parts = _CSS_STRING.split(_CSS_STRING_OR_COMMENT.sub(lambda m: m.group(1) or '', src))
+    out = []
+    for i, part in enumerate(parts):
+        if i % 2:  # string literal, keep verbatim
+            out.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        part = part.replace(';}', '}')
+        out.append(part)
+    return ''.join(out).strip()
+
+
+def _skip_quoted(src, i):
+    """Index just past the string literal starting at ``src[i]``."""
+    quote, i = src[i], i + 1
+    while i < len(src):
+        ch = src[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == quote:
+            return i + 1
+        if quote == '`' and src.startswith('${', i):
+            i = _skip_braces(src, i + 2)
+            continue
+        i += 1
+    return i
+
+
+def _skip_braces(src, i):
+    """Index just past the ``}`` closing a template substitution."""
+    depth = 1
+    while i < len(src) and depth:
+        ch = src[i]
+        if ch in '"\'`':
+            i = _skip_quoted(src, i)
+            continue
+        depth += {'{': 1, '}': -1}.get(ch, 0)
+        i += 1
+    return i
+
+
+def _skip_regex(src, i):
+    in_class, i = False, i + 1
+    while i < len(src) and src[i] != '\n':
+        ch = src[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '[':
+            in_class = True
+        elif ch == ']':
+            in_class = False
+        elif ch == '/' and not in_class:
+            i += 1
+            while i < len(src) and src[i].isalpha():  # flags
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+# A ``/`` after one of these starts a regex literal, not a division
+_REGEX_KEYWORDS = frozenset(('return', 'typeof', 'case', 'in', 'of', 'instanceof', 'new',
+                             'delete', 'void', 'throw', 'do', 'else', 'yield', 'await'))
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in '_$'
+
+
+def minify_js(src):
+    """Drop comments, indentation, blank lines and repeated spaces.
+
+    Line breaks are kept so automatic semicolon insertion is unaffected;
+    strings, template literals and regex literals are copied verbatim.
+    """
+    out, i, n = [], 0, len(src)
+    last = ''  # last significant character emitted
+    word = ''  # last token, when it was an identifier, keyword or number
+    while i < n:
+        ch = src[i]
+        if ch in '"\'`':
+            j = _skip_quoted(src, i)
+            out.append(src[i:j])
+            last, word, i = ch, '', j
+        elif src.startswith('//', i):
+            i = src.find('\n', i)
+            i = n if i < 0 else i
+        elif src.startswith('/*', i):
+            j = src.find('*/', i + 2)
+            i = n if j < 0 else j + 2
+            if out and out[-1] not in ' \n':
+                out.append(' ')
+        elif ch == '/' and (not last or last in '(,=:[!&|?{};+-*%<>~^\n'
+                            or word in _REGEX_KEYWORDS):
+            j = _skip_regex(src, i)
+            out.append(src[i:j])
+            last, word, i = '/', '', j
+        elif ch.isspace():
+            j = i
+            while j < n and src[j].isspace():
+                j += 1
+            newline = '\n' in src[i:j]
+            if out and out[-1] not in ' \n':
+                out.append('\n' if newline else ' ')
+            elif newline and out and out[-1] == ' ':
+                out[-1] = '\n'
+            i = j
+        elif _is_word_char(ch):
+            j = i + 1
+            while j < n and _is_word_char(src[j]):
+                j += 1
+            word = src[i:j]
+            out.append(word)
+            last, i = src[j - 1], j
+        else:
+            out.append(ch)
+            last, word, i = ch, '', i + 1
+    return ''.join(out).strip() + '\n'
+
+
+def _minify(name, text):
+    if name.endswith('.css'):
+        return minify_css(text)
+    if name.endswith('.js'):
+        return minify_js(text)
+    return text
+
+
+# ─── Build ────────────────────────────────────────────────────────────────────
+def _hashed_name(name, data):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(name)
+    return f'{root}.{digest}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _compress(path, data):
+    """Write .gz/.br variants when they are actually smaller; returns their sizes."""
+    sizes = {}
+    if len(data) < MIN_COMPRESS_SIZE:
+        return sizes
+    variants = [('gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('br', brotli.compress(data, quality=11)))
+    for ext, blob in variants:
+        if len(blob) < len(data):
+            _write(f'{path}.{ext}', blob)
+            sizes[ext] = len(blob)
+    return sizes
+
+
+def build_assets(static_folder):
+    """Rebuild static/dist and its manifest; returns one report row per output.
+
+    Outputs that minify to nothing are skipped (``file`` is None in their row).
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    sources = {}
+    bundled = {src for srcs in BUNDLES.values() for src in srcs}
+    for name, srcs in BUNDLES.items():
+        sources[name] = srcs
+    for sub in ('css', 'js'):
+        folder = os.path.join(static_folder, sub)
+        for fname in sorted(os.listdir(folder)) if os.path.isdir(folder) else ():
+            name = f'{sub}/{fname}'
+            if name not in bundled and fname.endswith(('.css', '.js')):
+                sources[name] = [name]
+
+    manifest, report = {}, []
+    for name, srcs in sources.items():
+        texts = []
+        for src in srcs:
+            with open(os.path.join(static_folder, src), encoding='utf-8') as f:
+                texts.append(f.read())
+        raw = ('\n' if name.endswith('.css') else ';\n').join(texts)
+        data = _minify(name, raw).encode()
+        if not data.strip():
+            # Nothing to serve (e.g. a comment-only stylesheet): no fingerprinted
+            # empty file, and asset_urls() keeps linking the source
+            report.append({'name': name, 'file': None, 'source': len(raw.encode()), 'minified': 0})
+            continue
+        hashed = _hashed_name(name, data)
+        path = os.path.join(dist, hashed)
+        _write(path, data)
+        sizes = _compress(path, data)
+        manifest[name] = hashed
+        report.append({'name': name, 'file': f'{DIST_DIR}/{hashed}', 'source': len(raw.encode()),
+                       'minified': len(data), **sizes})
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return report
+
+
+# ─── Serving ──────────────────────────────────────────────────────────────────
+def _load_manifest(app):
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_urls(name):
+    """URLs to include for a bundle or file: the hashed build, else its sources."""
+    manifest = current_app.extensions[EXT_KEY]
+    if name in manifest:
+        return [url_for('assets', filename=manifest[name])]
+    return [url_for('static', filename=src) for src in BUNDLES.get(name, [name])]
+
+
+def serve_asset(filename):
+    """Hashed build output: immutable caching plus the pre-compressed variant."""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    if filename == MANIFEST or filename.endswith(('.gz', '.br')):
+        raise NotFound()
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, ext in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(dist, filename + ext)):
+            response = send_from_directory(dist, filename + ext, mimetype=mimetype,
+                                           max_age=31536000)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, mimetype=mimetype, max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    use_manifest = app.config.get('ASSETS_USE_MANIFEST')
+    if use_manifest is None:
+        use_manifest = not app.debug
+    app.extensions[EXT_KEY] = _load_manifest(app) if use_manifest else {}
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals['asset_urls'] = asset_urls
@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request, session
 from flask_login import login_user, logout_user, login_required, current_user
-from models import db, User, LoginAttempt
-from datetime import datetime, timedelta
+from models import db, User
+from datetime import datetime
+from apps.ratelimit import get_limiter
+from apps.cart import merge_session_cart
 import secrets
 import html
 
@@ -20,48 +22,17 @@ def _get_client_ip():
 
 def _check_brute_force(ip, username):
     """Returns (is_blocked, attempts_left, blocked_until)."""
-    attempt = LoginAttempt.query.filter_by(
-        ip_address=ip, username=username
-    ).first()
-    if not attempt:
-        return False, MAX_ATTEMPTS, None
-
-    # Check if block has expired
-    if attempt.blocked_until and datetime.utcnow() > attempt.blocked_until:
-        attempt.attempts = 0
-        attempt.blocked_until = None
-        db.session.commit()
-        return False, MAX_ATTEMPTS, None
-
-    if attempt.blocked_until:
-        return True, 0, attempt.blocked_until
-
-    return False, max(0, MAX_ATTEMPTS - attempt.attempts), None
+    return get_limiter().check(ip, username)
 
 
 def _record_failed_attempt(ip, username):
-    """Record a failed login attempt, block if threshold exceeded."""
-    attempt = LoginAttempt.query.filter_by(ip_address=ip, username=username).first()
-    if not attempt:
-        attempt = LoginAttempt(ip_address=ip, username=username, attempts=1)
-        db.session.add(attempt)
-    else:
-        attempt.attempts += 1
-        attempt.last_attempt = datetime.utcnow()
-
-    if attempt.attempts >= MAX_ATTEMPTS:
-        attempt.blocked_until = datetime.utcnow() + timedelta(minutes=LOCKOUT_MINUTES)
-
-    db.session.commit()
+    """Record a failed login attempt; returns the state after recording it."""
+    return get_limiter().record_failure(ip, username)
 
 
 def _clear_attempts(ip, username):
     """Clear attempts on successful login."""
-    attempt = LoginAttempt.query.filter_by(ip_address=ip, username=username).first()
-    if attempt:
-        attempt.attempts = 0
-        attempt.blocked_until = None
-        db.session.commit()
+    get_limiter().clear(ip, username)
 
 
 def _sanitize(value):
@@ -138,6 +109,7 @@ def login():
     if user and user.check_password(password):
         _clear_attempts(ip, username)
         login_user(user)
+        merge_session_cart(user.id, session.pop('cart_session_id', None))
         return jsonify({
             'success': True,
             'message': 'Logged in successfully',
@@ -149,8 +121,7 @@ def login():
             }
         })
 
-    _record_failed_attempt(ip, username)
-    _, attempts_left, _ = _check_brute_force(ip, username)
+    _, attempts_left, _ = _record_failed_attempt(ip, username)
     msg = f'Invalid credentials. {attempts_left} attempt(s) remaining.'
     if attempts_left == 0:
         msg = f'Too many failed attempts. Blocked for {LOCKOUT_MINUTES} minutes.'
@@ -184,6 +155,7 @@ def admin_login():
 
         _clear_attempts(ip, username)
         login_user(user)
+        merge_session_cart(user.id, session.pop('cart_session_id', None))
         return jsonify({
             'success': True,
             'message': 'Admin login successful',
@@ -194,8 +166,7 @@ def admin_login():
             }
         })
 
-    _record_failed_attempt(ip, username)
-    _, attempts_left, _ = _check_brute_force(ip, username)
+    _, attempts_left, _ = _record_failed_attempt(ip, username)
     msg = f'Invalid credentials. {attempts_left} attempt(s) remaining.'
     if attempts_left == 0:
         msg = f'Too many failed attempts. Blocked for {LOCKOUT_MINUTES} minutes.'
@@ -209,16 +180,18 @@ def logout():
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
 
+def user_dict(user):
+    """Public fields of the signed-in user (/auth/me, /api/bootstrap)."""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'is_admin': user.is_admin,
+    }
+
+
 @auth_bp.route('/me', methods=['GET'])
 def get_current_user():
     if current_user.is_authenticated:
-        return jsonify({
-            'success': True,
-            'user': {
-                'id': current_user.id,
-                'username': current_user.username,
-                'email': current_user.email,
-                'is_admin': current_user.is_admin
-            }
-        })
+        return jsonify({'success': True, 'user': user_dict(current_user)})
     return jsonify({'success': False, 'message': 'Not logged in'}), 401
@@ -0,0 +1,191 @@
+"""
+Catalog read cache.
+
+Public catalog responses (categories, banners, UI config, featured products)
+only change when an admin writes, so they are kept as pre-serialized JSON
+bytes in a per-process LRU with a TTL. Every entry is tagged with the catalog
+*content version*; a commit that touches a catalog model bumps the version,
+and entries built under an older version are treated as misses.
+
+The version is the mtime of a file in the instance folder, so a bump in one
+gunicorn worker is seen by all the others on their next request (one
+``stat()`` call, no DB round-trip).
+
+Stock levels change on every checkout, far more often than the rest of the
+catalog, so they have their own *inventory* version. Only responses that
+embed product rows depend on it; categories, banners and UI config stay
+cached through a flash sale.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from models import db, Product, Category, BannerSlide, UIAsset
+from apps.serializers import dumps
+
+EXT_KEY = 'catalog_cache'
+
+CATALOG_MODELS = (Product, Category, BannerSlide, UIAsset)
+
+
+class ContentVersion:
+    """A monotonically increasing version shared by all workers via file mtime."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        ns = max(time.time_ns(), self.get() + 1)
+        with open(self.path, 'a'):
+            pass
+        os.utime(self.path, ns=(ns, ns))
+        return ns
+
+
+class CachedBody(bytes):
+    """An encoded response body as stored in the cache. Compressed variants
+    are memoized on it (see apps/compression.py), so they live and expire
+    with the entry instead of being recomputed per request."""
+
+    def __new__(cls, data):
+        self = super().__new__(cls, data)
+        self.encoded = {}
+        return self
+
+
+class ResponseCache:
+    """Size-bounded LRU of serialized bodies, each tagged with a version and expiry."""
+
+    def __init__(self, version, inventory, max_entries=256, ttl=60):
+        self.version = version
+        self.inventory = inventory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            e_version, expires, body = entry
+            if e_version != version or expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def current_version(self, inventory=False):
+        """Version tuple a response depends on; compare entries by equality."""
+        if inventory:
+            return self.version.get(), self.inventory.get()
+        return (self.version.get(),)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def init_cache(app):
+    os.makedirs(app.instance_path, exist_ok=True)
+    path = app.config.get('CATALOG_VERSION_FILE') or os.path.join(
+        app.instance_path, 'catalog.version')
+    inventory_path = app.config.get('INVENTORY_VERSION_FILE') or os.path.join(
+        app.instance_path, 'inventory.version')
+    cache = ResponseCache(
+        ContentVersion(path),
+        ContentVersion(inventory_path),
+        max_entries=app.config.get('CATALOG_CACHE_SIZE', 256),
+        ttl=app.config.get('CATALOG_CACHE_TTL', 60),
+    )
+    for version in (cache.version, cache.inventory):
+        if version.get() == 0:
+            version.bump()
+    app.extensions[EXT_KEY] = cache
+    return cache
+
+
+def get_cache():
+    return current_app.extensions[EXT_KEY]
+
+
+def bump_catalog_version():
+    """Invalidate cached catalog responses in every worker."""
+    if has_app_context() and EXT_KEY in current_app.extensions:
+        get_cache().version.bump()
+
+
+def bump_inventory_version():
+    """Invalidate cached responses that embed product stock levels."""
+    if has_app_context() and EXT_KEY in current_app.extensions:
+        get_cache().inventory.bump()
+
+
+def cached_body(key, render, inventory=False):
+    """The bytes returned by ``render()``, through the catalog cache.
+
+    Pass ``inventory=True`` when the body includes product rows.
+    """
+    cache = get_cache()
+    # Read the version before querying so a concurrent bump can only cause
+    # an extra miss, never a stale entry under the new version.
+    version = cache.current_version(inventory)
+    body = cache.get(key, version)
+    if body is None:
+        body = CachedBody(render())
+        cache.set(key, version, body)
+    return body
+
+
+def cached_bytes(key, build, inventory=False):
+    """JSON bytes for the payload returned by ``build()``, through the catalog cache.
+
+    Encoded like the uncached listings (``serializers.dumps``), so a resource
+    has the same byte layout whichever path serves it.
+    """
+    return cached_body(key, lambda: dumps(build()), inventory)
+
+
+def cached_json(key, build, inventory=False):
+    """Serve the JSON payload returned by ``build()`` through the catalog cache."""
+    return current_app.response_class(cached_bytes(key, build, inventory),
+                                      mimetype='application/json')
+
+
+# ─── Invalidation on commit ───────────────────────────────────────────────────
+@event.listens_for(db.session, 'after_flush')
+def _track_catalog_writes(session, flush_context):
+    if session.info.get('catalog_dirty'):
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info['catalog_dirty'] = True
+            return
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('catalog_dirty', False):
+        bump_catalog_version()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('catalog_dirty', None)
@@ -0,0 +1,210 @@
+"""
+Cart service.
+
+A cart is the set of ``CartItem`` lines of one owner: the user when signed
+in, otherwise the anonymous ``cart_session_id``. (owner, product) is unique,
+so writes never look lines up first. A batch of operations is folded per
+product, then applied with one ``INSERT ... ON CONFLICT DO UPDATE``, one
+DELETE and a single commit, however many clicks it carries:
+
+    {"op": "add",    "product_id": 3, "quantity": 2}   add to the line
+    {"op": "set",    "product_id": 3, "quantity": 5}   replace; 0 removes
+    {"op": "remove", "product_id": 3}
+
+Responses carry the cart with totals computed from current effective prices,
+so clients render what checkout will charge.
+
+On login the guest cart is merged into the user's with one
+``INSERT ... SELECT ... ON CONFLICT`` (quantities add up). Every write stamps
+``updated_at``; guest carts idle for ``CART_TTL_DAYS`` are deleted by
+``flask cart-purge`` in short chunks, each its own transaction, so the write
+lock is never held for long.
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify
+from sqlalchemy import bindparam, delete, select, text
+from models import db, Product, CartItem, CART_WITH_PRODUCT
+
+MAX_OPS = 100
+MAX_LINE_QUANTITY = 99
+OPS = ('add', 'set', 'remove')
+
+# New quantity on conflict, capped at MAX_LINE_QUANTITY
+_ADDED = (f'CASE WHEN cart_item.quantity + excluded.quantity > {MAX_LINE_QUANTITY} '
+          f'THEN {MAX_LINE_QUANTITY} ELSE cart_item.quantity + excluded.quantity END')
+
+
+class CartError(ValueError):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def to_response(self):
+        return jsonify({'success': False, 'message': self.message, **self.details}), self.status
+
+
+def _owner_clause(uid, sid):
+    return CartItem.user_id == uid if uid else CartItem.session_id == sid
+
+
+def _int(value, name, low, high):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise CartError(f'{name} must be an integer')
+    if not low <= value <= high:
+        raise CartError(f'{name} must be between {low} and {high}')
+    return value
+
+
+def fold_ops(ops):
+    """Validate ``ops`` and collapse them to {product_id: ('add'|'set', quantity)}.
+
+    Later operations on a product build on earlier ones, so a burst of
+    clicks becomes one write per product; ('set', 0) means remove.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise CartError('ops must be a non-empty list')
+    if len(ops) > MAX_OPS:
+        raise CartError(f'At most {MAX_OPS} operations per request')
+
+    folded = {}
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in OPS:
+            raise CartError(f'Unknown op {kind!r}. Use: {list(OPS)}')
+        pid = _int(op.get('product_id'), 'product_id', 1, 2**63 - 1)
+        if kind == 'remove':
+            folded[pid] = ('set', 0)
+            continue
+        if kind == 'set':
+            folded[pid] = ('set', _int(op.get('quantity'), 'quantity', 0, MAX_LINE_QUANTITY))
+            continue
+        qty = _int(op.get('quantity', 1), 'quantity', 1, MAX_LINE_QUANTITY)
+        prev_kind, prev_qty = folded.get(pid, ('add', 0))
+        folded[pid] = (prev_kind, min(prev_qty + qty, MAX_LINE_QUANTITY))
+    return folded
+
+
+def _upsert_statement(uid):
+    owner = 'user_id' if uid else 'session_id'
+    return text(
+        'INSERT INTO cart_item (user_id, session_id, product_id, quantity, updated_at) '
+        'VALUES (:uid, :sid, :pid, :qty, :now) '
+        f'ON CONFLICT ({owner}, product_id) DO UPDATE SET '
+        f'quantity = CASE WHEN :replace THEN excluded.quantity ELSE {_ADDED} END, '
+        'updated_at = excluded.updated_at'
+    ).bindparams(bindparam('replace', type_=db.Boolean), bindparam('now', type_=db.DateTime))
+
+
+def apply_ops(uid, sid, ops):
+    """Apply a batch of cart operations for one owner in a single transaction."""
+    folded = fold_ops(ops)
+    writes = {pid: v for pid, v in folded.items() if v[1] > 0}
+    removes = [pid for pid, v in folded.items() if v[1] == 0]
+
+    if writes:
+        live = set(db.session.scalars(select(Product.id).where(
+            Product.id.in_(writes), Product.is_deleted == False)))
+        missing = sorted(set(writes) - live)
+        if missing:
+            raise CartError('Product not found', 404, product_ids=missing)
+        now = datetime.utcnow()
+        db.session.execute(_upsert_statement(uid), [
+            {'uid': uid, 'sid': None if uid else sid, 'pid': pid, 'qty': qty,
+             'replace': kind == 'set', 'now': now}
+            for pid, (kind, qty) in writes.items()])
+    if removes:
+        db.session.execute(
+            delete(CartItem).where(_owner_clause(uid, sid), CartItem.product_id.in_(removes)),
+            execution_options={'synchronize_session': False})
+    db.session.commit()
+
+
+_MERGE = text(
+    'INSERT INTO cart_item (user_id, session_id, product_id, quantity, updated_at) '
+    'SELECT :uid, NULL, product_id, quantity, :now FROM cart_item '
+    'WHERE session_id = :sid AND user_id IS NULL '
+    f'ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = {_ADDED}, '
+    'updated_at = excluded.updated_at'
+).bindparams(bindparam('now', type_=db.DateTime))
+
+
+def merge_session_cart(uid, sid):
+    """Move the guest cart ``sid`` into the user's cart; returns the lines moved."""
+    if not uid or not sid:
+        return 0
+    db.session.execute(_MERGE, {'uid': uid, 'sid': sid, 'now': datetime.utcnow()})
+    moved = db.session.execute(
+        delete(CartItem).where(CartItem.session_id == sid, CartItem.user_id.is_(None)),
+        execution_options={'synchronize_session': False}).rowcount
+    db.session.commit()
+    return moved
+
+
+def purge_guest_carts(days=None, chunk=None, pause=0.0):
+    """Delete guest cart lines untouched for ``days``; returns the number deleted.
+
+    Lines from before ``updated_at`` existed have no timestamp and count as
+    expired. Each chunk commits on its own, so the write lock is held for one
+    short DELETE at a time; ``pause`` (seconds) spaces chunks out further.
+    """
+    cfg = current_app.config
+    days = cfg.get('CART_TTL_DAYS', 30) if days is None else days
+    chunk = chunk or cfg.get('CART_PURGE_CHUNK', 5000)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    total = 0
+    # Two index range scans (IS NULL, then < cutoff); an OR would walk every guest line
+    for stale in (CartItem.updated_at.is_(None), CartItem.updated_at < cutoff):
+        expired = select(CartItem.id).where(CartItem.user_id.is_(None), stale).limit(chunk)
+        while True:
+            deleted = db.session.execute(
+                delete(CartItem).where(CartItem.id.in_(expired.scalar_subquery())),
+                execution_options={'synchronize_session': False}).rowcount
+            db.session.commit()
+            total += deleted
+            if deleted < chunk:
+                break
+            if pause:
+                time.sleep(pause)
+    return total
+
+
+def _lines(uid, sid):
+    if not uid and not sid:
+        return []
+    return (CartItem.query.options(*CART_WITH_PRODUCT)
+            .filter(_owner_clause(uid, sid)).order_by(CartItem.id).all())
+
+
+def _item(line):
+    return {
+        'product_id': line.product_id,
+        'quantity': line.quantity,
+        'product': line.product.to_dict() if line.product else None,
+    }
+
+
+def cart_summary(uid, sid):
+    """Lines plus server-side totals: item count and subtotal at effective prices.
+
+    Lines whose product was deleted are listed without a price and left out
+    of the subtotal (checkout rejects them).
+    """
+    items, count, subtotal = [], 0, 0.0
+    for line in _lines(uid, sid):
+        item = _item(line)
+        product, unit = line.product, None
+        if product is not None and not product.is_deleted:
+            unit = product.price if product.effective_price is None else product.effective_price
+            subtotal += unit * line.quantity
+        item['unit_price'] = unit
+        item['line_total'] = round(unit * line.quantity, 2) if unit is not None else None
+        count += line.quantity
+        items.append(item)
+    return {'items': items, 'count': count, 'subtotal': round(subtotal, 2)}
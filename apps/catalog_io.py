@@ -0,0 +1,465 @@
+"""
+Bulk catalog import/export for products and categories (CSV and JSONL).
+
+Imports stream the input and work in chunks of ``IMPORT_CHUNK`` rows: each
+chunk is validated, then written with executemany. Products are matched on
+``sku`` (or ``id`` when there is no sku), categories on ``slug``; unmatched
+rows are inserted. Category slugs are resolved from a single lookup per run.
+Invalid rows are reported by line number and skipped; the run carries on.
+
+Empty CSV cells mean "not given": new rows get the column default and
+existing rows keep their value. Send ``null`` in JSONL to clear a field.
+
+Core writes bypass the ORM pricing hooks, so inserts are priced inline and
+updated rows are repriced per chunk. The search index follows through its
+triggers; cached catalog responses and dashboard counters are refreshed once
+at the end.
+"""
+import csv
+import html
+import io
+import json
+import math
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Product, Category
+from apps.cache import bump_catalog_version
+from apps.pricing import effective_price, naive_utc, reprice_products
+from apps.stats import recount_stats
+
+IMPORT_CHUNK = 1000
+EXPORT_CHUNK = 1000
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('csv', 'jsonl')
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+# ─── Field Converters ─────────────────────────────────────────────────────────
+# Each takes a non-empty raw value and returns the stored value or raises ValueError.
+def _text(max_len=None):
+    def conv(value):
+        # Unescape first so re-importing an export does not double-escape
+        value = html.escape(html.unescape(str(value).strip()))
+        if max_len and len(value) > max_len:
+            raise ValueError(f'longer than {max_len} characters')
+        return value or None
+    return conv
+
+
+def _url(max_len):
+    def conv(value):
+        # URLs are stored verbatim (escaping would break query strings) but
+        # only web schemes are accepted
+        value = str(value).strip()
+        if len(value) > max_len:
+            raise ValueError(f'longer than {max_len} characters')
+        if ':' in value.split('/', 1)[0] and urlsplit(value).scheme not in ('http', 'https'):
+            raise ValueError('only http(s) URLs are allowed')
+        return value or None
+    return conv
+
+
+def _number(kind, minimum=None, maximum=None):
+    def conv(value):
+        if isinstance(value, bool):
+            raise ValueError('not a number')
+        try:
+            number = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'not a valid {kind.__name__}')
+        if isinstance(number, float) and not math.isfinite(number):
+            raise ValueError('not a finite number')
+        if minimum is not None and number < minimum:
+            raise ValueError(f'must be at least {minimum}')
+        if maximum is not None and number > maximum:
+            raise ValueError(f'must be at most {maximum}')
+        return number
+    return conv
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y'):
+        return True
+    if text in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError('not a boolean')
+
+
+def _datetime(value):
+    try:
+        return naive_utc(datetime.fromisoformat(str(value).strip()))
+    except ValueError:
+        raise ValueError('not an ISO-8601 datetime')
+
+
+# field -> (converter, nullable)
+PRODUCT_FIELDS = {
+    'sku': (_text(64), True),
+    'name': (_text(200), False),
+    'description': (_text(), True),
+    'price': (_number(float, 0), False),
+    'old_price': (_number(float, 0), True),
+    'discount': (_number(float, 0, 100), False),
+    'is_discount': (_bool, False),
+    'discount_price': (_number(float, 0), True),
+    'discount_starts_at': (_datetime, True),
+    'discount_ends_at': (_datetime, True),
+    'image': (_url(500), True),
+    'brand': (_text(100), True),
+    'stock': (_number(int, 0), False),
+    'rating': (_number(float, 0, 5), False),
+    'rating_count': (_number(int, 0), False),
+    'tag': (_text(50), True),
+    'is_featured': (_bool, False),
+    'is_deleted': (_bool, False),
+    'category_id': (_number(int, 1), True),
+    'category': (_text(100), True),  # category slug, resolved to category_id
+}
+
+CATEGORY_FIELDS = {
+    'name': (_text(100), False),
+    'slug': (_text(100), False),
+    'image_url': (_url(500), True),
+    'sort_order': (_number(int), False),
+    'is_active': (_bool, False),
+}
+
+PRICING_FIELDS = ('price', 'old_price', 'discount', 'is_discount', 'discount_price',
+                  'discount_starts_at', 'discount_ends_at')
+
+
+def _clean(raw, fields):
+    """Convert one raw row; returns only the fields it actually provides."""
+    if not isinstance(raw, dict):
+        raise ValueError('row is not an object')
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            raise ValueError('more cells than header columns')
+        key = key.strip()
+        if key == 'id':
+            if value not in (None, ''):
+                row['id'] = _number(int, 1)(value)
+            continue
+        if key not in fields or value == '':
+            continue
+        conv, nullable = fields[key]
+        if value is None:
+            if not nullable:
+                raise ValueError(f'{key}: cannot be null')
+            row[key] = None
+            continue
+        try:
+            row[key] = conv(value)
+        except ValueError as e:
+            raise ValueError(f'{key}: {e}')
+    return row
+
+
+def _defaults(model, names):
+    """Scalar column defaults for inserts, so every executemany row has the same keys."""
+    cols = model.__table__.c
+    out = {}
+    for name in names:
+        default = cols[name].default
+        out[name] = default.arg if default is not None and default.is_scalar else None
+    return out
+
+
+# ─── Reading ──────────────────────────────────────────────────────────────────
+def detect_format(filename='', mimetype=''):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or mimetype == 'text/csv':
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or mimetype in (
+            'application/jsonl', 'application/x-ndjson', 'application/x-jsonlines'):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or None, parse error or None) from a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream, restval='')
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line), None
+            except ValueError as e:
+                yield number, None, f'invalid JSON: {e}'
+    else:
+        raise CatalogImportError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+class CatalogImport:
+    """One import run; feed it rows with :meth:`run`, read the totals from :meth:`summary`."""
+
+    def __init__(self, kind='products', chunk_size=IMPORT_CHUNK):
+        if kind not in ('products', 'categories'):
+            raise CatalogImportError(f'Unknown catalog kind {kind!r}')
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.created = self.updated = self.failed = 0
+        self.errors = []
+        self._slugs = None
+        self._category_ids = None
+
+    def fail(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def summary(self):
+        return {'created': self.created, 'updated': self.updated, 'failed': self.failed,
+                'errors': self.errors}
+
+    def run(self, rows):
+        """Import (line, raw row, parse error) tuples as produced by :func:`read_rows`."""
+        fields = PRODUCT_FIELDS if self.kind == 'products' else CATEGORY_FIELDS
+        chunk = []
+        for line, raw, error in rows:
+            if error:
+                self.fail(line, error)
+                continue
+            try:
+                chunk.append((line, _clean(raw, fields)))
+            except ValueError as e:
+                self.fail(line, str(e))
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk)
+                chunk = []
+        if chunk:
+            self._write(chunk)
+        if self.created or self.updated:
+            bump_catalog_version()
+            # Core writes skip the counter hooks
+            recount_stats()
+        return self.summary()
+
+    # ── Chunk planning ──
+    def _write(self, chunk):
+        plan = self._plan_products(chunk) if self.kind == 'products' else self._plan_categories(chunk)
+        inserts, updates = plan
+        model = Product if self.kind == 'products' else Category
+        try:
+            self._execute(model, inserts, updates)
+            db.session.commit()
+            self.created += len(inserts)
+            self.updated += len(updates)
+        except SQLAlchemyError:
+            db.session.rollback()
+            self._write_one_by_one(model, inserts, updates)
+        if self.kind == 'products':
+            repriced = [values['_id'] for _, values in updates.values()
+                        if any(f in values for f in PRICING_FIELDS)]
+            if repriced:
+                reprice_products(ids=repriced)
+
+    def _plan_products(self, chunk):
+        """Split a chunk into (inserts, updates), merging repeated keys in order.
+
+        inserts: {key: (lines, values)}; updates: {product id: (lines, values)}.
+        """
+        if self._slugs is None:
+            self._slugs = dict(db.session.execute(select(Category.slug, Category.id)).all())
+            self._category_ids = set(self._slugs.values())
+
+        skus = {row['sku'] for _, row in chunk if row.get('sku')}
+        ids = {row['id'] for _, row in chunk if 'id' in row and not row.get('sku')}
+        by_sku = dict(db.session.execute(
+            select(Product.sku, Product.id).where(Product.sku.in_(skus))).all()) if skus else {}
+        known_ids = set(db.session.scalars(
+            select(Product.id).where(Product.id.in_(ids)))) if ids else set()
+
+        inserts, updates = {}, {}
+        for line, row in chunk:
+            try:
+                self._resolve_category(row)
+            except ValueError as e:
+                self.fail(line, str(e))
+                continue
+            pid = row.pop('id', None)
+            sku = row.get('sku')
+            if sku and sku in by_sku:
+                pid = by_sku[sku]
+            elif sku:
+                pid = None
+            elif pid is not None and pid not in known_ids:
+                self.fail(line, f'no product with id {pid}')
+                continue
+
+            if pid is None:
+                key = sku or ('row', line)
+                lines, values = inserts.setdefault(key, ([], {}))
+            else:
+                lines, values = updates.setdefault(pid, ([], {'_id': pid}))
+            lines.append(line)
+            values.update(row)
+
+        for key in list(inserts):
+            lines, values = inserts[key]
+            missing = [f for f in ('name', 'price') if values.get(f) is None]
+            if missing:
+                for line in lines:
+                    self.fail(line, f'new product needs {" and ".join(missing)}')
+                del inserts[key]
+                continue
+            full = _defaults(Product, [f for f in PRODUCT_FIELDS if f != 'category'])
+            full.update(values)
+            full['effective_price'] = effective_price(*(full[f] for f in PRICING_FIELDS))
+            inserts[key] = (lines, full)
+        return inserts, updates
+
+    def _resolve_category(self, row):
+        if 'category' in row:
+            slug = row.pop('category')
+            if slug is None:
+                row['category_id'] = None
+            elif slug not in self._slugs:
+                raise ValueError(f'category: unknown slug {slug!r}')
+            else:
+                row['category_id'] = self._slugs[slug]
+        elif row.get('category_id') is not None and row['category_id'] not in self._category_ids:
+            raise ValueError(f'category_id: no category with id {row["category_id"]}')
+
+    def _plan_categories(self, chunk):
+        slugs = {row['slug'] for _, row in chunk if row.get('slug')}
+        by_slug = dict(db.session.execute(
+            select(Category.slug, Category.id).where(Category.slug.in_(slugs))).all())
+
+        inserts, updates = {}, {}
+        for line, row in chunk:
+            row.pop('id', None)
+            slug = row.get('slug')
+            if not slug:
+                self.fail(line, 'slug is required')
+                continue
+            if slug in by_slug:
+                lines, values = updates.setdefault(by_slug[slug], ([], {'_id': by_slug[slug]}))
+            else:
+                lines, values = inserts.setdefault(slug, ([], {}))
+            lines.append(line)
+            values.update(row)
+
+        for slug in list(inserts):
+            lines, values = inserts[slug]
+            if not values.get('name'):
+                for line in lines:
+                    self.fail(line, 'new category needs name')
+                del inserts[slug]
+                continue
+            full = _defaults(Category, list(CATEGORY_FIELDS))
+            full.update(values)
+            inserts[slug] = (lines, full)
+        return inserts, updates
+
+    # ── Writes ──
+    def _execute(self, model, inserts, updates):
+        table = model.__table__
+        if inserts:
+            db.session.execute(insert(table), [values for _, values in inserts.values()])
+        groups = {}
+        for _, values in updates.values():
+            groups.setdefault(frozenset(values), []).append(values)
+        for keys, rows in groups.items():
+            cols = sorted(k for k in keys if k != '_id')
+            if not cols:
+                continue
+            stmt = update(table).where(table.c.id == bindparam('_id')).values(
+                {c: bindparam('v_' + c) for c in cols})
+            db.session.execute(stmt, [
+                {'_id': r['_id'], **{'v_' + c: r[c] for c in cols}} for r in rows])
+
+    def _write_one_by_one(self, model, inserts, updates):
+        """Fallback when a batch fails (e.g. a constraint): isolate the bad rows."""
+        for ops, is_insert in ((inserts, True), (updates, False)):
+            for key, (lines, values) in ops.items():
+                try:
+                    self._execute(model, {key: (lines, values)} if is_insert else {},
+                                  {} if is_insert else {key: (lines, values)})
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    message = str(getattr(e, 'orig', None) or e).splitlines()[0]
+                    for line in lines:
+                        self.fail(line, f'database error: {message}')
+                    continue
+                if is_insert:
+                    self.created += 1
+                else:
+                    self.updated += 1
+
+
+def import_catalog(stream, kind='products', fmt='csv', chunk_size=IMPORT_CHUNK):
+    """Import a text stream; returns {'created', 'updated', 'failed', 'errors'}."""
+    if fmt not in FORMATS:
+        raise CatalogImportError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    return CatalogImport(kind, chunk_size).run(read_rows(stream, fmt))
+
+
+# ─── Export ───────────────────────────────────────────────────────────────────
+PRODUCT_EXPORT = ['id', 'sku', 'name', 'description', 'price', 'old_price', 'discount',
+                  'is_discount', 'discount_price', 'discount_starts_at', 'discount_ends_at',
+                  'image', 'brand', 'stock', 'rating', 'rating_count', 'tag', 'is_featured',
+                  'is_deleted', 'category']
+CATEGORY_EXPORT = ['id', 'name', 'slug', 'image_url', 'sort_order', 'is_active']
+
+
+def _export_statement(kind, include_deleted):
+    if kind == 'categories':
+        cols = [getattr(Category, c) for c in CATEGORY_EXPORT]
+        return select(*cols).order_by(Category.sort_order, Category.id), CATEGORY_EXPORT
+    if kind != 'products':
+        raise CatalogImportError(f'Unknown catalog kind {kind!r}')
+    cols = [getattr(Product, c) for c in PRODUCT_EXPORT[:-1]] + [Category.slug.label('category')]
+    stmt = select(*cols).outerjoin(Category, Product.category_id == Category.id).order_by(Product.id)
+    if not include_deleted:
+        stmt = stmt.where(Product.is_deleted == False)
+    return stmt, PRODUCT_EXPORT
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_catalog(kind='products', fmt='csv', include_deleted=False):
+    """Yield the catalog as text chunks, reading rows with ``yield_per``."""
+    if fmt not in FORMATS:
+        raise CatalogImportError(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    stmt, header = _export_statement(kind, include_deleted)
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_CHUNK))
+
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n') if fmt == 'csv' else None
+    if writer:
+        writer.writerow(header)
+    for partition in result.partitions():
+        for row in partition:
+            values = [_plain(v) for v in row]
+            if writer:
+                writer.writerow(['' if v is None else v for v in values])
+            else:
+                buf.write(json.dumps(dict(zip(header, values)), separators=(',', ':')))
+                buf.write('\n')
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
@@ -0,0 +1,174 @@
+"""
+Checkout pipeline.
+
+A checkout is one transaction with a fixed number of statements, whatever
+the size of the cart:
+
+1. claim the cart — DELETE the owner's cart lines RETURNING what they held;
+2. reserve stock — one conditional UPDATE that decrements every product
+   only where ``stock >= quantity`` (RETURNING the effective unit price);
+3. insert the order and bulk-insert its lines.
+
+If any product is short the transaction is rolled back and the caller gets
+the shortfalls; nothing is oversold because the stock check and decrement
+are the same statement. A client-supplied idempotency key makes a retried
+request return the original order instead of placing a second one.
+"""
+from collections import defaultdict
+
+from flask import jsonify
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Product, CartItem, Order, OrderItem
+from apps.cache import bump_inventory_version
+
+MAX_IDEMPOTENCY_KEY = 64
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def to_response(self):
+        return jsonify({'success': False, 'message': self.message, **self.details}), self.status
+
+
+def _owner_clause(uid, sid):
+    return CartItem.user_id == uid if uid else CartItem.session_id == sid
+
+
+def _supports_returning(dialect):
+    return dialect.delete_returning and dialect.update_returning
+
+
+def find_replay(key, uid, sid):
+    """Return the order already placed with ``key`` by this owner, if any."""
+    order = Order.query.filter_by(idempotency_key=key).first()
+    if order is None:
+        return None
+    if (uid and order.user_id != uid) or (not uid and order.session_id != sid):
+        raise CheckoutError('Idempotency key already used', 422)
+    return order
+
+
+def _claim_cart(owner, returning):
+    """Remove the cart lines and return {product_id: quantity}."""
+    if returning:
+        rows = db.session.execute(
+            delete(CartItem).where(owner)
+            .returning(CartItem.product_id, CartItem.quantity),
+            execution_options={'synchronize_session': False},
+        ).all()
+    else:
+        lines = db.session.execute(
+            select(CartItem.id, CartItem.product_id, CartItem.quantity).where(owner)).all()
+        ids = [line.id for line in lines]
+        result = db.session.execute(
+            delete(CartItem).where(CartItem.id.in_(ids)),
+            execution_options={'synchronize_session': False},
+        )
+        if result.rowcount != len(ids):
+            # Another checkout claimed the same lines first
+            return {}
+        rows = [(line.product_id, line.quantity) for line in lines]
+
+    wanted = defaultdict(int)
+    for product_id, quantity in rows:
+        if quantity and quantity > 0:
+            wanted[product_id] += quantity
+    return dict(wanted)
+
+
+def _reserve_stock(wanted, returning):
+    """Decrement stock for every product or none; return {product_id: unit price}."""
+    unit_price = func.coalesce(Product.effective_price, Product.price)
+    qty = case(wanted, value=Product.id)
+    stmt = update(Product).where(
+        Product.id.in_(wanted),
+        Product.is_deleted == False,
+        Product.stock >= qty,
+    ).values(stock=Product.stock - qty)
+    opts = {'synchronize_session': False}
+
+    if returning:
+        rows = db.session.execute(stmt.returning(Product.id, unit_price),
+                                  execution_options=opts).all()
+        return {pid: float(price) for pid, price in rows}
+
+    result = db.session.execute(stmt, execution_options=opts)
+    if result.rowcount != len(wanted):
+        return {}
+    rows = db.session.execute(
+        select(Product.id, unit_price).where(Product.id.in_(wanted))).all()
+    return {pid: float(price) for pid, price in rows}
+
+
+def _shortfalls(wanted):
+    rows = db.session.execute(
+        select(Product.id, Product.stock, Product.is_deleted).where(Product.id.in_(wanted))
+    ).all()
+    available = {r.id: (0 if r.is_deleted else (r.stock or 0)) for r in rows}
+    return [
+        {'product_id': pid, 'requested': qty, 'available': available.get(pid, 0)}
+        for pid, qty in sorted(wanted.items())
+        if available.get(pid, 0) < qty
+    ]
+
+
+def place_order(uid, sid, idempotency_key=None):
+    """Turn the owner's cart into an order.
+
+    Returns (order_id, total, replayed). Raises CheckoutError.
+    """
+    if idempotency_key:
+        existing = find_replay(idempotency_key, uid, sid)
+        if existing:
+            return existing.id, existing.total_amount, True
+
+    returning = _supports_returning(db.session.get_bind().dialect)
+    owner = _owner_clause(uid, sid)
+
+    wanted = _claim_cart(owner, returning)
+    if not wanted:
+        db.session.rollback()
+        # A concurrent retry with the same key may have just taken the cart
+        if idempotency_key:
+            existing = find_replay(idempotency_key, uid, sid)
+            if existing:
+                return existing.id, existing.total_amount, True
+        raise CheckoutError('Cart is empty', 400)
+
+    prices = _reserve_stock(wanted, returning)
+    if len(prices) != len(wanted):
+        db.session.rollback()
+        raise CheckoutError('Some items are no longer available in the requested quantity',
+                            409, out_of_stock=_shortfalls(wanted))
+
+    # Unit prices are rounded to cents (apps/pricing.py); so is the total
+    total = round(sum(prices[pid] * qty for pid, qty in wanted.items()), 2)
+    try:
+        order = Order(user_id=uid, session_id=sid, total_amount=total,
+                      status='pending', idempotency_key=idempotency_key)
+        db.session.add(order)
+        db.session.flush()
+        order_id = order.id
+
+        db.session.execute(insert(OrderItem), [
+            {'order_id': order_id, 'product_id': pid, 'quantity': qty,
+             'price_at_purchase': prices[pid]}
+            for pid, qty in wanted.items()
+        ])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if idempotency_key:
+            existing = find_replay(idempotency_key, uid, sid)
+            if existing:
+                return existing.id, existing.total_amount, True
+        raise
+
+    bump_inventory_version()
+    return order_id, total, False
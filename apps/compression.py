@@ -0,0 +1,94 @@
+"""
+Response compression (gzip, and brotli when the optional ``brotli`` package
+is installed).
+
+An ``after_request`` hook compresses text responses (JSON, HTML, CSS, JS, …)
+of at least ``COMPRESS_MIN_SIZE`` bytes for clients that accept it. Bodies
+served from the response cache are ``CachedBody`` instances; their
+compressed variants are memoized on the cache entry, so a cached product
+list is compressed once per version instead of once per request.
+
+Skipped: streamed responses (exports), files sent with ``send_file`` (the
+hashed assets are pre-compressed at build time), anything already encoded,
+non-200 responses and ``Cache-Control: no-transform``.
+"""
+import gzip
+
+from flask import current_app, request
+from apps.cache import CachedBody
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'application/json', 'application/x-ndjson', 'text/html', 'text/css', 'text/csv',
+    'text/plain', 'text/javascript', 'application/javascript', 'image/svg+xml',
+)
+
+
+def compress(data, encoding):
+    cfg = current_app.config
+    if encoding == 'br':
+        return brotli.compress(data, quality=cfg.get('COMPRESS_BR_QUALITY', 5))
+    return gzip.compress(data, compresslevel=cfg.get('COMPRESS_LEVEL', 6), mtime=0)
+
+
+def _negotiate():
+    """Preferred encoding the client accepts (br over gzip), or None."""
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def _compress_response(response):
+    cfg = current_app.config
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in cfg['COMPRESS_MIMETYPES']
+            or response.cache_control.no_transform):
+        return response
+
+    chunks = response.response
+    if len(chunks) == 1 and isinstance(chunks[0], CachedBody):
+        body = chunks[0]
+    else:
+        body = response.get_data()
+    if len(body) < cfg['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    if isinstance(body, CachedBody):
+        data = body.encoded.get(encoding)
+        if data is None:
+            data = body.encoded[encoding] = compress(body, encoding)
+    else:
+        data = compress(body, encoding)
+    if len(data) >= len(body):
+        return response
+
+    response.set_data(data)
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Same resource, different bytes: a strong validator no longer applies
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    cfg = app.config
+    cfg.setdefault('COMPRESS_ENABLED', True)
+    cfg.setdefault('COMPRESS_MIN_SIZE', 1024)
+    cfg.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+    if cfg['COMPRESS_ENABLED']:
+        app.after_request(_compress_response)
@@ -0,0 +1,225 @@
+"""
+Database connection profile.
+
+SQLite (the default deployment: a few gunicorn workers on one file):
+
+* every connection gets WAL journaling (readers and the writer no longer
+  block each other), ``synchronous=NORMAL``, a busy timeout so writers queue
+  instead of failing with "database is locked", memory-mapped I/O and a
+  larger page cache, all set from a connect-event hook;
+* a second, ``query_only`` pool is registered as the ``read`` bind; the
+  routing session (models/session.py) runs clean SELECTs there, so reads
+  don't hold connections in the write pool and can never write by accident.
+
+pysqlite only opens a transaction at the first write, so write transactions
+don't begin with a read snapshot that would need upgrading (the other
+classic source of "database is locked").
+
+Server databases (PostgreSQL, MySQL) get pool sizing, recycling and
+pre-ping options instead. Explicit ``SQLALCHEMY_ENGINE_OPTIONS`` always win.
+
+Read replicas (``DATABASE_REPLICA_URLS``, comma-separated) are registered as
+``replica1``, ``replica2``, … binds and served by :class:`ReadRouter`:
+
+* only GET/HEAD/OPTIONS requests read from replicas; other methods, and
+  work outside requests (bootstrap, CLI jobs that read then write), run on
+  the primary;
+* after a request commits a write, that client stays on the primary for
+  ``DB_STICKY_SECONDS`` so it reads its own writes. The deadline travels in
+  its own cookie, set only on write responses; the session is never read for
+  routing, so cacheable GET responses don't pick up ``Vary: Cookie``;
+* each replica is probed at most every ``REPLICA_CHECK_INTERVAL`` seconds.
+  It is skipped while unreachable, after a connection error, or while its
+  replay lag exceeds ``REPLICA_MAX_LAG``. Lag is measured where the server
+  exposes it (PostgreSQL); other replicas are liveness-checked only.
+
+"On the primary" still means the local ``read`` pool for clean SELECTs
+(SQLite), since it is the same database; with no healthy replica, reads fall
+back to it too, or to the primary itself.
+"""
+import itertools
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from models.session import READ_BIND, ROUTER_KEY, RoutingSession
+
+REPLICA_PREFIX = 'replica'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary_until'
+
+_LAG_QUERIES = {
+    'postgresql': 'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)',
+}
+
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configure_database(app):
+    """Fill in engine options and the read bind; call before ``db.init_app``."""
+    cfg = app.config
+    uri = cfg['SQLALCHEMY_DATABASE_URI']
+    explicit = cfg.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+
+    replicas = [u.strip() for u in (cfg.get('DATABASE_REPLICA_URLS') or '').split(',') if u.strip()]
+    if replicas:
+        binds = dict(cfg.get('SQLALCHEMY_BINDS') or {})
+        for n, url in enumerate(replicas, 1):
+            binds.setdefault(f'{REPLICA_PREFIX}{n}', url)
+        cfg['SQLALCHEMY_BINDS'] = binds
+
+    if make_url(uri).get_backend_name() == 'sqlite':
+        options = {}
+        if _is_sqlite_file(uri) and cfg.get('SQLITE_READ_POOL', True):
+            binds = dict(cfg.get('SQLALCHEMY_BINDS') or {})
+            binds.setdefault(READ_BIND, {'url': uri, **explicit})
+            cfg['SQLALCHEMY_BINDS'] = binds
+    else:
+        options = {
+            'pool_size': cfg.get('DB_POOL_SIZE', 5),
+            'max_overflow': cfg.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': cfg.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': cfg.get('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': True,
+        }
+    cfg['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **explicit}
+
+
+def _pragmas(app, read_only):
+    cfg = app.config
+    pragmas = [
+        ('journal_mode', cfg.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', cfg.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', cfg.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        ('mmap_size', cfg.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        ('cache_size', -cfg.get('SQLITE_CACHE_SIZE_KB', 20000)),  # negative = KiB
+        ('temp_store', 'MEMORY'),
+    ]
+    if read_only:
+        pragmas.append(('query_only', 'ON'))
+    return pragmas
+
+
+def _install_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def _is_replica(key):
+    return bool(key) and key.startswith(REPLICA_PREFIX)
+
+
+def init_database(app, db):
+    """Attach the per-connection hooks and the read router; call after ``db.init_app``."""
+    with app.app_context():
+        engines = db.engines
+    for key, engine in engines.items():
+        if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            _install_pragmas(engine, _pragmas(app, read_only=key == READ_BIND or _is_replica(key)))
+
+    replicas = sorted(k for k in engines if _is_replica(k))
+    if replicas:
+        router = ReadRouter(
+            replicas,
+            check_interval=app.config.get('REPLICA_CHECK_INTERVAL', 5),
+            max_lag=app.config.get('REPLICA_MAX_LAG', 10),
+        )
+        for key in replicas:
+            router.watch(key, engines[key])
+        app.extensions[ROUTER_KEY] = router
+        _install_sticky_writes(app)
+
+
+# ─── Read Replicas ────────────────────────────────────────────────────────────
+class ReadRouter:
+    """Picks a healthy replica for a read, else the local read pool (None: the primary)."""
+
+    def __init__(self, keys, check_interval=5, max_lag=10):
+        self.keys = list(keys)
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._status = {}  # key -> (healthy, checked at)
+        self._lock = threading.Lock()
+        self._next = itertools.cycle(range(len(self.keys)))
+
+    def watch(self, key, engine):
+        @event.listens_for(engine, 'handle_error')
+        def _on_error(context):
+            # Take the replica out of rotation until the next probe
+            if context.is_disconnect or context.connection is None:
+                self._status[key] = (False, time.monotonic())
+
+    def reader(self, engines):
+        if not has_request_context() or g.get('db_primary'):
+            return engines.get(READ_BIND)
+        start = next(self._next)
+        for i in range(len(self.keys)):
+            key = self.keys[(start + i) % len(self.keys)]
+            if self.healthy(key, engines[key]):
+                return engines[key]
+        return engines.get(READ_BIND)
+
+    def healthy(self, key, engine):
+        status = self._status.get(key)
+        now = time.monotonic()
+        if status is not None and now - status[1] < self.check_interval:
+            return status[0]
+        with self._lock:
+            status = self._status.get(key)
+            if status is None or now - status[1] >= self.check_interval:
+                status = (self._probe(engine), time.monotonic())
+                self._status[key] = status
+        return status[0]
+
+    def _probe(self, engine):
+        try:
+            with engine.connect() as conn:
+                lag_sql = _LAG_QUERIES.get(engine.dialect.name)
+                if lag_sql is None:
+                    conn.execute(text('SELECT 1'))
+                    return True
+                return float(conn.execute(text(lag_sql)).scalar() or 0) <= self.max_lag
+        except SQLAlchemyError:
+            return False
+
+    def status(self):
+        return {key: self._status.get(key, (None, None))[0] for key in self.keys}
+
+
+def _install_sticky_writes(app):
+    """Keep a client on the primary for a while after it writes."""
+
+    def _sticky_until():
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return 0
+
+    @app.before_request
+    def _route_request():
+        g.db_primary = request.method not in READ_METHODS or _sticky_until() > time.time()
+
+    @app.after_request
+    def _stick_after_write(response):
+        sticky = app.config.get('DB_STICKY_SECONDS', 5)
+        if g.pop('db_wrote', False) and sticky:
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + sticky:.3f}', max_age=int(sticky) + 1,
+                                httponly=True, samesite='Lax',
+                                secure=app.config.get('SESSION_COOKIE_SECURE', False))
+        return response
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _note_write(session):
+    if session.info.get('on_writer') and has_request_context():
+        g.db_wrote = True
@@ -0,0 +1,70 @@
+"""
+Conditional GET for the public catalog API.
+
+Validators come from the catalog content version (see apps/cache.py) rather
+than from hashing the body, so a repeat request carrying a current ETag is
+answered with 304 before the view runs — no query, no serialization.
+
+Views that return product rows use ``@conditional(inventory=True)`` so their
+validators also change when stock moves.
+
+Last-Modified has 1-second resolution, so it is only sent once the second
+of the last change is over; a response from that same second could be
+followed by another change that an If-Modified-Since check would miss.
+Such responses still carry the ETag.
+"""
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request
+from apps.cache import get_cache
+
+
+def _validators(inventory):
+    versions = get_cache().current_version(inventory)
+    path_hash = zlib.crc32(request.full_path.encode())
+    etag = '.'.join(f'{v:x}' for v in versions) + f'-{path_hash:08x}'
+    # Versions are mtimes in ns; HTTP dates have 1-second resolution
+    changed = max(versions) // 1_000_000_000
+    if changed >= time.time_ns() // 1_000_000_000:
+        return etag, None
+    return etag, datetime.fromtimestamp(changed, tz=timezone.utc)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry the weak form of the tag
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(f=None, *, inventory=False):
+    """Add ETag/Last-Modified/Cache-Control to a catalog GET view and honour
+    If-None-Match / If-Modified-Since with 304."""
+    if f is None:
+        return lambda view: conditional(view, inventory=inventory)
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        etag, last_modified = _validators(inventory)
+        if _not_modified(etag, last_modified):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = (
+            f"public, max-age={current_app.config.get('API_CACHE_MAX_AGE', 30)}, "
+            f"s-maxage={current_app.config.get('API_CACHE_S_MAXAGE', 60)}, "
+            f"stale-while-revalidate={current_app.config.get('API_CACHE_SWR', 30)}"
+        )
+        return response
+    return decorated
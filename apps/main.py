@@ -1,7 +1,16 @@
-from flask import Blueprint, render_template, jsonify, request
-from flask_login import login_required, current_user
-from models import db, Product, Category, BannerSlide, UIAsset, CartItem, Order, OrderItem
-from functools import lru_cache
+from flask import Blueprint, current_app, render_template, jsonify, request
+from flask_login import current_user
+from models import db, Product, Category, BannerSlide, UIAsset
+from markupsafe import Markup
+from apps import search
+from apps.pagination import paginate_listing, sort_keys
+from apps.serializers import (PRODUCT, CATEGORY, BANNER, requested_fields, requested_format,
+                              serialize_list, json_response, dumps)
+from apps.cache import cached_body, cached_bytes, cached_json, get_cache
+from apps.http_cache import conditional
+from apps.checkout import place_order, CheckoutError, MAX_IDEMPOTENCY_KEY
+from apps.cart import CartError, apply_ops, cart_summary
+from apps.auth import user_dict
 
 main_bp = Blueprint('main', __name__)
 
@@ -9,27 +18,43 @@ main_bp = Blueprint('main', __name__)
 # ─── Pages ────────────────────────────────────────────────────────────────────
 @main_bp.route('/')
 def home():
-    return render_template('index.html')
+    ssr = current_app.config.get('SSR_INITIAL_STATE')
+
+    def render():
+        state = _initial_state() if ssr else None
+        categories = _categories_data() if ssr else None
+        return render_template('index.html', initial_state=state, categories=categories).encode()
+
+    if current_app.debug:  # pick up template edits immediately
+        return render()
+    # The page is the same for every visitor, so it is cached (and compressed)
+    # once per catalog version like the API responses
+    return current_app.response_class(cached_body(f'page:home:{int(bool(ssr))}', render),
+                                      mimetype='text/html')
 
 
 # ─── UI Config (Dynamic CMS) ──────────────────────────────────────────────────
 @main_bp.route('/api/ui-config', methods=['GET'])
+@conditional
 def get_ui_config():
-    """Return all UIAssets as {key: value} JSON. Cached per request cycle."""
-    assets = UIAsset.query.all()
-    config = {a.key: a.value for a in assets}
-    return jsonify(config)
+    """Return all UIAssets as {key: value} JSON. Served from the catalog cache."""
+    return cached_json('ui-config', _ui_config_data)
+
+
+def _ui_config_data():
+    return {a.key: a.value for a in UIAsset.query.all()}
 
 
 # ─── Products API ─────────────────────────────────────────────────────────────
 @main_bp.route('/api/products', methods=['GET'])
+@conditional(inventory=True)
 def get_products():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 12, type=int)
     category_id = request.args.get('category_id', type=int)
     featured = request.args.get('featured', type=int)
     tag = request.args.get('tag')
     sort = request.args.get('sort', 'newest')  # newest, price_asc, price_desc, rating
+    fields = requested_fields(PRODUCT)
+    fmt = requested_format()
 
     q = Product.query.filter_by(is_deleted=False)
 
@@ -40,142 +65,223 @@ def get_products():
     if tag:
         q = q.filter_by(tag=tag)
 
-    if sort == 'price_asc':
-        q = q.order_by(Product.price.asc())
-    elif sort == 'price_desc':
-        q = q.order_by(Product.price.desc())
-    elif sort == 'rating':
-        q = q.order_by(Product.rating.desc())
-    else:
-        q = q.order_by(Product.id.desc())
-
-    products = q.paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify({
-        'success': True,
-        'products': [p.to_dict() for p in products.items],
-        'total': products.total,
-        'pages': products.pages,
-        'page': page,
-    })
+    def build():
+        rows, meta = paginate_listing(PRODUCT.query(q, fields, extra=sort_keys(sort)), sort,
+                                      default_per_page=12)
+        return {
+            'success': True,
+            'products': serialize_list(PRODUCT, rows, fields, fmt),
+            **meta,
+        }
+
+    # The homepage's featured strip is the same for every visitor
+    if featured:
+        return cached_json('products?' + request.query_string.decode(), build, inventory=True)
+    return json_response(build())
 
 
 @main_bp.route('/api/products/search', methods=['GET'])
+@conditional(inventory=True)
 def search_products():
     query = request.args.get('q', '').strip()
     if not query or len(query) < 2:
         return jsonify({'success': False, 'message': 'Query too short'}), 400
 
-    results = Product.query.filter(
-        Product.is_deleted == False,
-        db.or_(
-            Product.name.ilike(f'%{query}%'),
-            Product.description.ilike(f'%{query}%'),
-            Product.brand.ilike(f'%{query}%'),
-        )
-    ).limit(20).all()
+    fields = requested_fields(PRODUCT)
+    fmt = requested_format()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+    results = search.search_products(query, limit=limit)
 
-    return jsonify({'success': True, 'products': [p.to_dict() for p in results]})
+    return json_response({
+        'success': True,
+        'products': serialize_list(PRODUCT, PRODUCT.tuples(results, fields), fields, fmt),
+    })
 
 
 @main_bp.route('/api/products/<int:pid>', methods=['GET'])
+@conditional(inventory=True)
 def get_product(pid):
-    product = Product.query.filter_by(id=pid, is_deleted=False).first_or_404()
-    return jsonify({'success': True, 'product': product.to_dict()})
+    fields = requested_fields(PRODUCT)
+    row = PRODUCT.query(Product.query.filter_by(id=pid, is_deleted=False), fields).first_or_404()
+    return json_response({'success': True, 'product': PRODUCT.rows([row], fields)[0]})
 
 
 @main_bp.route('/api/products/sale', methods=['GET'])
+@conditional(inventory=True)
 def get_sale_products():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 12, type=int)
-    
-    q = Product.query.filter_by(is_deleted=False, is_discount=True)
-    q = q.order_by(Product.id.desc())
-
-    products = q.paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify({
+    sort = request.args.get('sort', 'newest')
+    fields = requested_fields(PRODUCT)
+    fmt = requested_format()
+    rows, meta = paginate_listing(PRODUCT.query(_sale_query(), fields, extra=sort_keys(sort)), sort,
+                                  default_per_page=12)
+    return json_response({
         'success': True,
-        'products': [p.to_dict() for p in products.items],
-        'total': products.total,
-        'pages': products.pages,
-        'page': page,
+        'products': serialize_list(PRODUCT, rows, fields, fmt),
+        **meta,
     })
 
 
+def _sale_query():
+    # On sale = flagged and currently priced below the reference price
+    return Product.query.filter_by(is_deleted=False, is_discount=True).filter(
+        Product.effective_price < db.func.coalesce(Product.old_price, Product.price))
+
+
 # ─── Categories API ───────────────────────────────────────────────────────────
 @main_bp.route('/api/categories', methods=['GET'])
+@conditional
 def get_categories():
-    cats = Category.query.filter_by(is_active=True).order_by(Category.sort_order).all()
-    return jsonify({'success': True, 'categories': [c.to_dict() for c in cats]})
+    return cached_json('categories', lambda: {'success': True, 'categories': _categories_data()})
+
+
+def _categories_data():
+    return CATEGORY.all(Category.query.filter_by(is_active=True).order_by(Category.sort_order))
 
 
 # ─── Banners API ──────────────────────────────────────────────────────────────
 @main_bp.route('/api/banners', methods=['GET'])
+@conditional
 def get_banners():
-    banners = BannerSlide.query.filter_by(is_active=True).order_by(
-        BannerSlide.sort_order).all()
-    return jsonify({'success': True, 'banners': [b.to_dict() for b in banners]})
+    return cached_json('banners', lambda: {'success': True, 'banners': _banners_data()})
 
 
-# ─── Cart API (server-side, session-based) ────────────────────────────────────
-@main_bp.route('/api/cart', methods=['GET'])
-def get_cart():
-    from flask import session as flask_session
-    sid = flask_session.get('cart_session_id')
-    uid = current_user.id if current_user.is_authenticated else None
+def _banners_data():
+    return BANNER.all(BannerSlide.query.filter_by(is_active=True).order_by(BannerSlide.sort_order))
 
-    items = []
-    if uid:
-        items = CartItem.query.filter_by(user_id=uid).all()
-    elif sid:
-        items = CartItem.query.filter_by(session_id=sid).all()
 
-    return jsonify({
-        'success': True,
-        'items': [{
-            'product_id': i.product_id,
-            'quantity': i.quantity,
-            'product': i.product.to_dict() if i.product else None,
-        } for i in items]
-    })
+# ─── Homepage Bootstrap (batched first-paint data) ────────────────────────────
+BOOTSTRAP_SECTIONS = ('ui_config', 'categories', 'banners', 'featured', 'sale', 'me', 'cart')
+BOOTSTRAP_STRIP_SIZE = 12
 
 
-@main_bp.route('/api/cart', methods=['POST'])
-def add_to_cart():
+def _product_strip(query, fields):
+    rows = PRODUCT.query(query.order_by(Product.id.desc()).limit(BOOTSTRAP_STRIP_SIZE),
+                         fields).all()
+    return PRODUCT.rows(rows, fields)
+
+
+def _shared_section(name, fields):
+    """Encoded JSON for a section that is the same for every visitor."""
+    if name in ('featured', 'sale'):
+        query = {
+            'featured': lambda: Product.query.filter_by(is_deleted=False, is_featured=True),
+            'sale': _sale_query,
+        }[name]()
+        return cached_bytes(f'bootstrap:{name}:{",".join(fields)}',
+                            lambda: _product_strip(query, fields), inventory=True)
+    build = {'ui_config': _ui_config_data, 'categories': _categories_data,
+             'banners': _banners_data}[name]
+    return cached_bytes(f'bootstrap:{name}', build)
+
+
+@main_bp.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Everything the homepage needs for first paint in one round-trip.
+
+    ``?include=ui_config,featured,...`` picks sections (default: all of them);
+    ``?fields=`` / ``?view=`` shape the featured and sale strips. Shared sections
+    come pre-encoded from the catalog cache; ``me`` and ``cart`` (the same
+    shape as GET /api/cart) are per visitor. The storefront loads its cart
+    and, without inline state, its UI config this way (ui-config.js).
+    """
+    from flask import session as flask_session
+    raw = request.args.get('include')
+    include = list(dict.fromkeys(
+        s.strip() for s in raw.split(',') if s.strip())) if raw else list(BOOTSTRAP_SECTIONS)
+    unknown = [s for s in include if s not in BOOTSTRAP_SECTIONS]
+    if unknown:
+        return jsonify({'success': False,
+                        'message': f'Unknown section(s): {", ".join(unknown)}. '
+                                   f'Use: {list(BOOTSTRAP_SECTIONS)}'}), 400
+    fields = requested_fields(PRODUCT)
+
+    uid = current_user.id if current_user.is_authenticated else None
+    parts = [b'"success":true']
+    for name in include:
+        if name == 'me':
+            body = dumps(user_dict(current_user) if uid else None)
+        elif name == 'cart':
+            body = dumps(cart_summary(uid, flask_session.get('cart_session_id')))
+        else:
+            body = _shared_section(name, fields)
+        parts.append(b'"' + name.encode() + b'":' + body)
+
+    return current_app.response_class(b'{' + b','.join(parts) + b'}',
+                                      mimetype='application/json')
+
+
+# ─── Server-Rendered Initial State ────────────────────────────────────────────
+# Inline JSON only for what the page scripts read on load (ui-config.js);
+# the category bar is rendered as HTML from the same cached data
+SSR_SECTIONS = ('ui_config',)
+
+# Escapes that keep JSON inert inside <script>; all of these only occur in strings
+_SCRIPT_ESCAPES = ((b'<', b'\\u003c'), (b'>', b'\\u003e'), (b'&', b'\\u0026'),
+                   ('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+
+def _initial_state():
+    """Inline JSON for the storefront's first paint (home page SSR mode).
+
+    Built from the same cached sections as /api/bootstrap and kept as one
+    fragment per catalog version, so an unchanged catalog renders the page
+    without touching the database.
+    """
+    cache = get_cache()
+    version = cache.current_version()
+    fragment = cache.get('ssr:initial-state', version)
+    if fragment is None:
+        body = b'{' + b','.join(b'"' + name.encode() + b'":' + _shared_section(name, None)
+                                for name in SSR_SECTIONS) + b'}'
+        for raw, escaped in _SCRIPT_ESCAPES:
+            body = body.replace(raw, escaped)
+        fragment = Markup(body.decode())
+        cache.set('ssr:initial-state', version, fragment)
+    return fragment
+
+
+# ─── Cart API (server-side, session-based) ────────────────────────────────────
+def _cart_owner(create=False):
+    """(user id, anonymous cart session id); ``create`` starts a session cart."""
     from flask import session as flask_session
     import uuid
-    data = request.get_json() or {}
-    product_id = data.get('product_id')
-    quantity = int(data.get('quantity', 1))
+    if current_user.is_authenticated:
+        return current_user.id, None
+    if create and 'cart_session_id' not in flask_session:
+        flask_session['cart_session_id'] = str(uuid.uuid4())
+    return None, flask_session.get('cart_session_id')
 
-    if not product_id:
-        return jsonify({'success': False, 'message': 'product_id required'}), 400
 
-    product = Product.query.filter_by(id=product_id, is_deleted=False).first()
-    if not product:
-        return jsonify({'success': False, 'message': 'Product not found'}), 404
+@main_bp.route('/api/cart', methods=['GET'])
+def get_cart():
+    return jsonify({'success': True, **cart_summary(*_cart_owner())})
 
-    uid = current_user.id if current_user.is_authenticated else None
-    sid = None
-    if not uid:
-        if 'cart_session_id' not in flask_session:
-            flask_session['cart_session_id'] = str(uuid.uuid4())
-        sid = flask_session['cart_session_id']
 
-    existing = CartItem.query.filter_by(
-        product_id=product_id,
-        user_id=uid,
-        session_id=sid
-    ).first()
+@main_bp.route('/api/cart', methods=['POST'])
+def add_to_cart():
+    data = request.get_json(silent=True) or {}
+    if not data.get('product_id'):
+        return jsonify({'success': False, 'message': 'product_id required'}), 400
+
+    uid, sid = _cart_owner(create=True)
+    try:
+        apply_ops(uid, sid, [{'op': 'add', 'product_id': data['product_id'],
+                              'quantity': data.get('quantity', 1)}])
+    except CartError as e:
+        return e.to_response()
+    return jsonify({'success': True, 'message': 'Added to cart', **cart_summary(uid, sid)})
 
-    if existing:
-        existing.quantity += quantity
-    else:
-        item = CartItem(product_id=product_id, user_id=uid,
-                        session_id=sid, quantity=quantity)
-        db.session.add(item)
 
-    db.session.commit()
-    return jsonify({'success': True, 'message': 'Added to cart'})
+@main_bp.route('/api/cart/batch', methods=['POST'])
+def update_cart():
+    """Apply ``{"ops": [...]}`` (add / set / remove) in one transaction; returns the cart."""
+    data = request.get_json(silent=True) or {}
+    uid, sid = _cart_owner(create=True)
+    try:
+        apply_ops(uid, sid, data.get('ops'))
+    except CartError as e:
+        return e.to_response()
+    return jsonify({'success': True, **cart_summary(uid, sid)})
 
 
 # ─── Checkout API ─────────────────────────────────────────────────────────────
@@ -185,30 +291,17 @@ def checkout():
     uid = current_user.id if current_user.is_authenticated else None
     sid = flask_session.get('cart_session_id')
 
-    items = []
-    if uid:
-        items = CartItem.query.filter_by(user_id=uid).all()
-    elif sid:
-        items = CartItem.query.filter_by(session_id=sid).all()
-
-    if not items:
+    if not uid and not sid:
         return jsonify({'success': False, 'message': 'Cart is empty'}), 400
 
-    total = sum(i.product.price * i.quantity for i in items if i.product)
-
-    order = Order(user_id=uid, session_id=sid, total_amount=total, status='pending')
-    db.session.add(order)
-    db.session.flush()
+    data = request.get_json(silent=True) or {}
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if key and len(key) > MAX_IDEMPOTENCY_KEY:
+        return jsonify({'success': False, 'message': 'Idempotency key too long'}), 400
 
-    for i in items:
-        oi = OrderItem(
-            order_id=order.id,
-            product_id=i.product_id,
-            quantity=i.quantity,
-            price_at_purchase=i.product.price if i.product else 0,
-        )
-        db.session.add(oi)
-        db.session.delete(i)
+    try:
+        order_id, total, replayed = place_order(uid, sid, key or None)
+    except CheckoutError as e:
+        return e.to_response()
 
-    db.session.commit()
-    return jsonify({'success': True, 'order_id': order.id, 'total': total})
+    return jsonify({'success': True, 'order_id': order_id, 'total': total, 'replayed': replayed})
@@ -0,0 +1,144 @@
+"""
+Streaming order export (CSV and NDJSON) for finance/reporting.
+
+One query joins orders, their lines, product names and usernames; rows are
+read with ``yield_per`` and written out batch by batch, so memory stays flat
+however many orders match.
+
+* CSV    one row per order line (orders without lines get one empty line)
+* NDJSON one object per order with its ``items``; rows arrive ordered by
+  order, so each order is assembled and emitted before the next begins.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import select
+from models import db, Order, OrderItem, Product, User
+from apps.pricing import naive_utc
+
+EXPORT_BATCH = 1000
+FORMATS = ('csv', 'ndjson')
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+
+CSV_HEADER = ['order_id', 'created_at', 'status', 'user_id', 'username', 'session_id',
+              'order_total', 'product_id', 'product_name', 'quantity', 'price', 'line_total']
+
+
+class InvalidExportFilter(ValueError):
+    pass
+
+
+def _parse_bound(value, end=False):
+    """ISO date or datetime; a bare date as the upper bound covers that whole day."""
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = datetime.fromisoformat(value).date()
+            return datetime.combine(day + timedelta(days=1) if end else day, time.min)
+        return naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise InvalidExportFilter(f'Invalid date {value!r}; use YYYY-MM-DD or ISO-8601')
+
+
+def parse_filters(date_from=None, date_to=None, status=None):
+    """Validate raw filter values; returns (start, end, statuses)."""
+    start = _parse_bound(date_from)
+    end = _parse_bound(date_to, end=True)
+    if start and end and start >= end:
+        raise InvalidExportFilter('"from" must be before "to"')
+    statuses = [s.strip() for s in (status or '').split(',') if s.strip()]
+    unknown = [s for s in statuses if s not in ORDER_STATUSES]
+    if unknown:
+        raise InvalidExportFilter(f'Invalid status {unknown[0]!r}. Use: {ORDER_STATUSES}')
+    return start, end, statuses
+
+
+def order_lines_statement(start=None, end=None, statuses=None):
+    """Order lines with order, product and user columns, ordered by order."""
+    stmt = (
+        select(Order.id.label('order_id'), Order.created_at, Order.status, Order.user_id,
+               User.username, Order.session_id, Order.total_amount.label('order_total'),
+               OrderItem.product_id, Product.name.label('product_name'), OrderItem.quantity,
+               OrderItem.price_at_purchase.label('price'))
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .outerjoin(User, User.id == Order.user_id)
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    )
+    if start:
+        stmt = stmt.where(Order.created_at >= start)
+    if end:
+        stmt = stmt.where(Order.created_at < end)
+    if statuses:
+        stmt = stmt.where(Order.status.in_(statuses))
+    return stmt
+
+
+def _rows(stmt):
+    """Yield batches of result rows without buffering the whole result."""
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
+    yield from result.partitions()
+
+
+def _csv_chunks(stmt):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(CSV_HEADER)
+    for batch in _rows(stmt):
+        for r in batch:
+            line_total = round(r.price * r.quantity, 2) if r.product_id is not None else None
+            writer.writerow(['' if v is None else v for v in (
+                r.order_id, r.created_at.isoformat() if r.created_at else None, r.status,
+                r.user_id, r.username, r.session_id, r.order_total, r.product_id,
+                r.product_name, r.quantity, r.price, line_total)])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _ndjson_chunks(stmt):
+    buf = io.StringIO()
+    current = None
+    for batch in _rows(stmt):
+        for r in batch:
+            if current is None or current['id'] != r.order_id:
+                if current is not None:
+                    buf.write(json.dumps(current, separators=(',', ':')) + '\n')
+                current = {
+                    'id': r.order_id,
+                    'created_at': r.created_at.isoformat() if r.created_at else None,
+                    'status': r.status,
+                    'user_id': r.user_id,
+                    'username': r.username,
+                    'session_id': r.session_id,
+                    'total_amount': r.order_total,
+                    'items': [],
+                }
+            if r.product_id is not None:
+                current['items'].append({
+                    'product_id': r.product_id,
+                    'product_name': r.product_name or '',
+                    'quantity': r.quantity,
+                    'price': r.price,
+                })
+        if buf.tell():
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if current is not None:
+        buf.write(json.dumps(current, separators=(',', ':')) + '\n')
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def export_orders(fmt='csv', date_from=None, date_to=None, status=None):
+    """Validate the filters and return a generator of text chunks."""
+    if fmt not in FORMATS:
+        raise InvalidExportFilter(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    stmt = order_lines_statement(*parse_filters(date_from, date_to, status))
+    return _csv_chunks(stmt) if fmt == 'csv' else _ndjson_chunks(stmt)
@@ -0,0 +1,145 @@
+"""
+Listing pagination: classic page/per_page plus keyset (cursor) mode.
+
+Keyset mode never issues COUNT(*) or OFFSET. The cursor is an opaque,
+URL-safe token holding (sort, last sort key, last id); the next page is
+everything strictly after that pair in the listing order, so deep pages
+cost the same as the first one.
+
+Clients opt in by sending ``cursor`` (empty for the first page) and follow
+``next_cursor`` until it is null. ``with_total=1`` adds an exact count.
+Cursor pages hold at most ``MAX_PER_PAGE`` rows; page mode keeps the
+``per_page`` it always accepted.
+"""
+import base64
+import json
+import math
+
+from flask import request, abort, jsonify, make_response
+from models import db, Product
+
+MAX_PER_PAGE = 100
+
+# sort name -> (sort column, descending)
+PRODUCT_SORTS = {
+    'newest': (Product.id, True),
+    'price_asc': (Product.effective_price, False),
+    'price_desc': (Product.effective_price, True),
+    'rating': (Product.rating, True),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, key, last_id):
+    raw = json.dumps([sort, key, last_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _valid_key(col, key):
+    """Whether ``key`` can stand for a value of the sort column ``col``."""
+    if key is None:
+        return bool(col.expression.nullable)
+    expected = col.type.python_type
+    if expected in (int, float):
+        return _is_number(key)
+    return expected is str and isinstance(key, str)
+
+
+def decode_cursor(cursor, sort, sorts=PRODUCT_SORTS):
+    """Return (key, last_id) from a cursor issued for ``sort``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        c_sort, key, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if c_sort != sort or sort not in sorts:
+        raise InvalidCursor('Cursor does not match this listing')
+    if not (isinstance(last_id, int) and not isinstance(last_id, bool)
+            and _valid_key(sorts[sort][0], key)):
+        raise InvalidCursor('Malformed cursor')
+    return key, last_id
+
+
+def order_by_sort(query, sort, sorts=PRODUCT_SORTS):
+    """Apply a named sort with the id tie-breaker that keeps ordering stable."""
+    col, desc = sorts.get(sort, sorts['newest'])
+    id_col = Product.id
+    if col is id_col:
+        return query.order_by(id_col.desc() if desc else id_col.asc())
+    if desc:
+        return query.order_by(col.desc(), id_col.desc())
+    return query.order_by(col.asc(), id_col.asc())
+
+
+def sort_keys(sort, sorts=PRODUCT_SORTS):
+    """Columns a listing must select for ``sort``; cursor mode reads them back."""
+    col, _ = sorts.get(sort, sorts['newest'])
+    return ('id', col.key)
+
+
+def _after(sort, key, last_id, sorts):
+    col, desc = sorts[sort]
+    id_col = Product.id
+    if col is id_col:
+        return id_col < last_id if desc else id_col > last_id
+    beyond = (lambda a, b: a < b) if desc else (lambda a, b: a > b)
+    past_id = beyond(id_col, last_id)
+    if not col.expression.nullable:
+        return db.or_(beyond(col, key), db.and_(col == key, past_id))
+    # NULLs sort lowest on SQLite/MySQL and highest on PostgreSQL
+    nulls_after = desc == (db.engine.dialect.name in ('sqlite', 'mysql', 'mariadb'))
+    if key is None:
+        rest = db.and_(col.is_(None), past_id)
+        return rest if nulls_after else db.or_(rest, col.is_not(None))
+    after = db.or_(beyond(col, key), db.and_(col == key, past_id))
+    return db.or_(after, col.is_(None)) if nulls_after else after
+
+
+def paginate_listing(query, sort='newest', default_per_page=12, sorts=PRODUCT_SORTS):
+    """Paginate ``query`` from the current request's args.
+
+    Returns (items, meta); ``meta`` holds the pagination fields to merge into
+    the JSON response. Page mode keeps the original total/pages/page fields.
+    """
+    if sort not in sorts:
+        sort = 'newest'
+    per_page = request.args.get('per_page', default_per_page, type=int)
+
+    if 'cursor' not in request.args:
+        page = request.args.get('page', 1, type=int)
+        result = order_by_sort(query, sort, sorts).paginate(
+            page=page, per_page=per_page, error_out=False)
+        return result.items, {'total': result.total, 'pages': result.pages, 'page': page}
+
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    meta = {}
+    if request.args.get('with_total', type=int):
+        meta['total'] = query.order_by(None).count()
+
+    cursor = request.args.get('cursor', '')
+    if cursor:
+        try:
+            key, last_id = decode_cursor(cursor, sort, sorts)
+        except InvalidCursor as e:
+            abort(make_response(jsonify({'success': False, 'message': str(e)}), 400))
+        query = query.filter(_after(sort, key, last_id, sorts))
+
+    rows = order_by_sort(query, sort, sorts).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = None
+    if has_more:
+        col, _ = sorts[sort]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, col.key), last.id)
+
+    meta.update({'next_cursor': next_cursor, 'has_more': has_more})
+    return rows, meta
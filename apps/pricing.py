@@ -0,0 +1,112 @@
+"""
+Pricing engine.
+
+``Product.effective_price`` is the one price customers are charged and that
+listings sort on. It is computed here, once per write, and persisted in an
+indexed column, so reads never recompute prices row by row.
+
+Rules (``old_price``, when set, is the undiscounted reference price):
+
+* not ``is_discount``                    -> ``price``
+* ``is_discount`` outside its window     -> ``old_price`` or ``price``
+* ``is_discount`` inside its window      -> ``discount_price`` if set,
+  else ``price`` when ``old_price`` marks it as already discounted,
+  else ``price`` less ``discount`` percent — never above ``price``.
+
+ORM writes are priced by mapper events. Promotion windows open and close on
+their own, so ``flask reprice`` (run it from cron, e.g. every few minutes)
+re-evaluates discounted products and persists any change in bulk.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, event, select, update
+from models import db, Product
+from apps.cache import bump_catalog_version
+
+REPRICE_BATCH = 1000
+
+
+def naive_utc(value):
+    """Promotion windows are stored as naive UTC; convert aware datetimes."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def promotion_active(starts_at, ends_at, now=None):
+    now = now or datetime.utcnow()
+    if starts_at and now < starts_at:
+        return False
+    if ends_at and now >= ends_at:
+        return False
+    return True
+
+
+def effective_price(price, old_price=None, discount=0, is_discount=False,
+                    discount_price=None, starts_at=None, ends_at=None, now=None):
+    """Price actually charged for one unit, rounded to cents."""
+    if price is None:
+        return None
+    if not is_discount:
+        return round(price, 2)
+    if not promotion_active(starts_at, ends_at, now):
+        return round(old_price or price, 2)
+
+    if discount_price:
+        sale = discount_price
+    elif old_price:
+        sale = price
+    elif discount and discount > 0:
+        sale = price * (1 - min(discount, 100) / 100)
+    else:
+        sale = price
+    return round(min(sale, price), 2)
+
+
+def price_product(product, now=None):
+    return effective_price(
+        product.price, product.old_price, product.discount, product.is_discount,
+        product.discount_price, product.discount_starts_at, product.discount_ends_at, now)
+
+
+@event.listens_for(Product, 'before_insert')
+@event.listens_for(Product, 'before_update')
+def _set_effective_price(mapper, connection, target):
+    target.effective_price = price_product(target)
+
+
+def reprice_products(only_missing=False, ids=None):
+    """Recompute effective prices that may have drifted; returns rows changed.
+
+    Covers rows with no price yet (new column, bulk loads) and every discounted
+    product, whose promotion window may have opened or closed since last run.
+    ``ids`` restricts the run to those products (after Core bulk updates).
+    """
+    P = Product
+    if ids is not None:
+        cond = P.id.in_(ids)
+    else:
+        cond = P.effective_price.is_(None)
+        if not only_missing:
+            cond = db.or_(cond, P.is_discount == True)
+
+    stmt = select(P.id, P.price, P.old_price, P.discount, P.is_discount, P.discount_price,
+                  P.discount_starts_at, P.discount_ends_at, P.effective_price).where(cond)
+    now = datetime.utcnow()
+    changes = []
+    for row in db.session.execute(stmt):
+        new = effective_price(row.price, row.old_price, row.discount, row.is_discount,
+                              row.discount_price, row.discount_starts_at,
+                              row.discount_ends_at, now)
+        if new != row.effective_price:
+            changes.append({'pid': row.id, 'ep': new})
+
+    upd = update(P.__table__).where(P.__table__.c.id == bindparam('pid')).values(
+        effective_price=bindparam('ep'))
+    for i in range(0, len(changes), REPRICE_BATCH):
+        db.session.execute(upd, changes[i:i + REPRICE_BATCH])
+    db.session.commit()
+
+    if changes:
+        bump_catalog_version()
+    return len(changes)
@@ -0,0 +1,82 @@
+"""
+Per-request query-count guard for debug and test runs.
+
+Every SQL statement executed while serving a request is counted; if an
+endpoint goes over its budget the request fails with QueryBudgetExceeded,
+so an N+1 regression shows up in development instead of production.
+
+The budget is checked before each commit, so an over-budget write fails
+without being saved. Statements that run after a request has committed
+(refreshing objects for the response) can no longer fail it; an overrun
+there is logged as a warning instead of turning a saved write into a 500.
+
+The default budget is ``QUERY_BUDGET``; individual views can override it
+with ``@query_budget(n)`` (``None`` disables the check for that view).
+"""
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(limit):
+    """Override the query budget of a single view."""
+    def decorator(f):
+        f._query_budget = limit
+        return f
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_query_count' in g:
+        g._query_count += 1
+
+
+def _over_budget(count):
+    """The over-budget message for the current request, or None."""
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, '_query_budget', current_app.config.get('QUERY_BUDGET', 10))
+    if budget is not None and count > budget:
+        return f'{request.method} {request.path} ran {count} queries (budget {budget})'
+    return None
+
+
+def _check_before_commit(session):
+    if has_request_context() and '_query_count' in g:
+        message = _over_budget(g._query_count)
+        if message:
+            raise QueryBudgetExceeded(message)
+        g._query_committed = True
+
+
+def init_query_budget(app):
+    enabled = app.config.get('QUERY_BUDGET_ENABLED')
+    if enabled is None:
+        enabled = app.debug or app.testing
+    if not enabled:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+    if not event.contains(db.session, 'before_commit', _check_before_commit):
+        event.listen(db.session, 'before_commit', _check_before_commit)
+
+    @app.before_request
+    def _start_query_count():
+        g._query_count = 0
+
+    @app.after_request
+    def _check_query_count(response):
+        count = g.pop('_query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        message = _over_budget(count)
+        if message:
+            if g.pop('_query_committed', False):
+                current_app.logger.warning('Query budget exceeded after commit: %s', message)
+            else:
+                raise QueryBudgetExceeded(message)
+        return response
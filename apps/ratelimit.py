@@ -0,0 +1,290 @@
+"""
+Login brute-force limiter.
+
+All backends share one interface, keyed by (client IP, username):
+
+* ``check(ip, username)``          -> (is_blocked, attempts_left, blocked_until)
+* ``record_failure(ip, username)`` -> the same tuple, after counting the failure
+* ``clear(ip, username)``          -> forget the key after a successful login
+* ``purge()``                      -> drop expired entries, returns how many
+
+Backends (``LOGIN_LIMITER_BACKEND``):
+
+``sqlite``   (default) a side SQLite file in WAL mode, shared by every gunicorn
+             worker on the host; one statement per call, never touches the
+             primary database.
+``memory``   a per-process sliding window; fastest, but each worker counts
+             separately — use it with a single worker or in tests.
+``database`` the original ``LoginAttempt`` table on the primary database.
+
+Failures are counted over a window of ``lockout`` seconds; reaching
+``max_attempts`` blocks the key for ``lockout`` seconds. Expired entries are
+purged by a background thread in each worker.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from models import db, LoginAttempt
+
+EXT_KEY = 'login_limiter'
+
+
+def _as_datetime(ts):
+    return datetime.utcfromtimestamp(ts) if ts else None
+
+
+class MemoryLimiter:
+    """Per-process sliding-window log of failure timestamps."""
+
+    def __init__(self, max_attempts, lockout):
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+        self._failures = {}
+        self._blocked = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key, now):
+        until = self._blocked.get(key)
+        if until and until > now:
+            return True, 0, _as_datetime(until)
+        if until:
+            self._blocked.pop(key, None)
+            self._failures.pop(key, None)
+        hits = self._failures.get(key)
+        while hits and hits[0] <= now - self.lockout:
+            hits.popleft()
+        return False, max(0, self.max_attempts - len(hits or ())), None
+
+    def check(self, ip, username):
+        with self._lock:
+            return self._state((ip, username), time.time())
+
+    def record_failure(self, ip, username):
+        key, now = (ip, username), time.time()
+        with self._lock:
+            blocked, _, _ = self._state(key, now)
+            if not blocked:
+                hits = self._failures.setdefault(key, deque())
+                hits.append(now)
+                if len(hits) >= self.max_attempts:
+                    self._blocked[key] = now + self.lockout
+            return self._state(key, now)
+
+    def clear(self, ip, username):
+        with self._lock:
+            self._failures.pop((ip, username), None)
+            self._blocked.pop((ip, username), None)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            stale = [k for k, hits in self._failures.items()
+                     if (not hits or hits[-1] <= now - self.lockout)
+                     and self._blocked.get(k, 0) <= now]
+            for k in stale:
+                self._failures.pop(k, None)
+                self._blocked.pop(k, None)
+            return len(stale)
+
+
+class SQLiteLimiter:
+    """Failure window per key in a WAL-mode SQLite side file shared across workers.
+
+    The window starts at the first failure and lasts ``lockout`` seconds; a
+    failure after it expires starts a new window.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS login_limit (
+            key TEXT PRIMARY KEY,
+            failures INTEGER NOT NULL,
+            first_at REAL NOT NULL,
+            blocked_until REAL
+        ) WITHOUT ROWID
+    """
+
+    _RECORD = """
+        INSERT INTO login_limit (key, failures, first_at, blocked_until)
+        VALUES (:key, 1, :now, CASE WHEN :max <= 1 THEN :until END)
+        ON CONFLICT (key) DO UPDATE SET
+            failures = CASE
+                WHEN blocked_until > :now THEN failures
+                WHEN first_at <= :window_start OR blocked_until IS NOT NULL THEN 1
+                ELSE failures + 1 END,
+            first_at = CASE
+                WHEN blocked_until > :now THEN first_at
+                WHEN first_at <= :window_start OR blocked_until IS NOT NULL THEN :now
+                ELSE first_at END,
+            blocked_until = CASE
+                WHEN blocked_until > :now THEN blocked_until
+                WHEN first_at <= :window_start OR blocked_until IS NOT NULL
+                    THEN CASE WHEN :max <= 1 THEN :until END
+                WHEN failures + 1 >= :max THEN :until
+                ELSE NULL END
+        RETURNING failures, first_at, blocked_until
+    """
+
+    def __init__(self, path, max_attempts, lockout):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(self._SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _result(self, row, now):
+        if row is None:
+            return False, self.max_attempts, None
+        failures, first_at, blocked_until = row
+        if blocked_until and blocked_until > now:
+            return True, 0, _as_datetime(blocked_until)
+        if blocked_until or first_at <= now - self.lockout:
+            return False, self.max_attempts, None
+        return False, max(0, self.max_attempts - failures), None
+
+    def _key(self, ip, username):
+        return f'{ip}\x1f{username or ""}'
+
+    def check(self, ip, username):
+        now = time.time()
+        row = self._connect().execute(
+            'SELECT failures, first_at, blocked_until FROM login_limit WHERE key = ?',
+            (self._key(ip, username),)).fetchone()
+        return self._result(row, now)
+
+    def record_failure(self, ip, username):
+        now = time.time()
+        row = self._connect().execute(self._RECORD, {
+            'key': self._key(ip, username),
+            'now': now,
+            'window_start': now - self.lockout,
+            'until': now + self.lockout,
+            'max': self.max_attempts,
+        }).fetchone()
+        return self._result(row, now)
+
+    def clear(self, ip, username):
+        self._connect().execute('DELETE FROM login_limit WHERE key = ?',
+                                (self._key(ip, username),))
+
+    def purge(self):
+        now = time.time()
+        cur = self._connect().execute(
+            'DELETE FROM login_limit WHERE first_at <= ? '
+            'AND (blocked_until IS NULL OR blocked_until <= ?)',
+            (now - self.lockout, now))
+        return cur.rowcount
+
+
+class DatabaseLimiter:
+    """The original LoginAttempt table on the primary database."""
+
+    def __init__(self, max_attempts, lockout):
+        self.max_attempts = max_attempts
+        self.lockout = lockout
+
+    def _get(self, ip, username):
+        return LoginAttempt.query.filter_by(ip_address=ip, username=username).first()
+
+    def _result(self, attempt):
+        if not attempt:
+            return False, self.max_attempts, None
+        if attempt.blocked_until and datetime.utcnow() < attempt.blocked_until:
+            return True, 0, attempt.blocked_until
+        if attempt.blocked_until:
+            return False, self.max_attempts, None
+        return False, max(0, self.max_attempts - attempt.attempts), None
+
+    def check(self, ip, username):
+        return self._result(self._get(ip, username))
+
+    def record_failure(self, ip, username):
+        now = datetime.utcnow()
+        attempt = self._get(ip, username)
+        if not attempt:
+            attempt = LoginAttempt(ip_address=ip, username=username, attempts=0)
+            db.session.add(attempt)
+        elif attempt.blocked_until and now < attempt.blocked_until:
+            return self._result(attempt)
+        elif attempt.blocked_until:
+            # Block expired: start counting again
+            attempt.attempts = 0
+            attempt.blocked_until = None
+
+        attempt.attempts += 1
+        attempt.last_attempt = now
+        if attempt.attempts >= self.max_attempts:
+            attempt.blocked_until = now + timedelta(seconds=self.lockout)
+        db.session.commit()
+        return self._result(attempt)
+
+    def clear(self, ip, username):
+        deleted = LoginAttempt.query.filter_by(ip_address=ip, username=username).delete()
+        if deleted:
+            db.session.commit()
+
+    def purge(self):
+        now = datetime.utcnow()
+        deleted = LoginAttempt.query.filter(
+            LoginAttempt.last_attempt <= now - timedelta(seconds=self.lockout),
+            db.or_(LoginAttempt.blocked_until.is_(None), LoginAttempt.blocked_until <= now),
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+# ─── Setup & Background Purge ─────────────────────────────────────────────────
+def init_limiter(app, max_attempts, lockout_minutes):
+    backend = app.config.get('LOGIN_LIMITER_BACKEND', 'sqlite')
+    lockout = lockout_minutes * 60
+    if backend == 'memory':
+        limiter = MemoryLimiter(max_attempts, lockout)
+    elif backend == 'database':
+        limiter = DatabaseLimiter(max_attempts, lockout)
+    elif backend == 'sqlite':
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = app.config.get('LOGIN_LIMITER_PATH') or os.path.join(
+            app.instance_path, 'ratelimit.db')
+        limiter = SQLiteLimiter(path, max_attempts, lockout)
+    else:
+        raise ValueError(f'Unknown LOGIN_LIMITER_BACKEND: {backend!r}')
+
+    limiter.purge_interval = app.config.get('LOGIN_LIMITER_PURGE_INTERVAL', 300)
+    limiter.purger_pid = None
+    app.extensions[EXT_KEY] = limiter
+    return limiter
+
+
+def _purge_loop(app, limiter):
+    while True:
+        time.sleep(limiter.purge_interval)
+        try:
+            with app.app_context():
+                limiter.purge()
+        except Exception as e:
+            app.logger.warning('Login limiter purge failed: %s', e)
+
+
+def get_limiter():
+    """The app's limiter; starts this worker's purge thread on first use."""
+    limiter = current_app.extensions[EXT_KEY]
+    # Threads do not survive gunicorn's fork, so start one per worker process
+    if limiter.purge_interval and limiter.purger_pid != os.getpid():
+        limiter.purger_pid = os.getpid()
+        threading.Thread(target=_purge_loop, name='login-limiter-purge', daemon=True,
+                         args=(current_app._get_current_object(), limiter)).start()
+    return limiter
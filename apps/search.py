@@ -0,0 +1,173 @@
+"""
+Product full-text search.
+
+On SQLite the searchable product columns are mirrored into an FTS5 shadow
+table (``product_fts``, rowid = product.id). Triggers on ``product`` keep it
+in sync for inserts, updates and soft-deletes, so every write path (admin
+CRUD, seed, raw SQL) is covered. Results are ranked with BM25 and every
+query term is matched as a prefix for type-ahead.
+
+Other backends (or SQLite builds without FTS5) use a ranked ILIKE fallback.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, Product
+
+EXT_KEY = 'product_search'
+
+# BM25 column weights: name, description, brand
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description, brand,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product
+    WHEN COALESCE(new.is_deleted, 0) = 0
+    BEGIN
+        INSERT INTO product_fts(rowid, name, description, brand)
+        VALUES (new.id, new.name, new.description, new.brand);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au
+    AFTER UPDATE OF name, description, brand, is_deleted ON product
+    BEGIN
+        DELETE FROM product_fts WHERE rowid = old.id;
+        INSERT INTO product_fts(rowid, name, description, brand)
+        SELECT new.id, new.name, new.description, new.brand
+        WHERE COALESCE(new.is_deleted, 0) = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product
+    BEGIN
+        DELETE FROM product_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def init_search(app):
+    """Create the FTS index and its sync triggers if the backend supports it.
+
+    Must run inside an app context after the ``product`` table exists.
+    """
+    state = {'fts': False}
+    app.extensions[EXT_KEY] = state
+
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return state
+
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+            )).first() is not None
+            for ddl in _FTS_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                _populate(conn)
+    except OperationalError as e:
+        # SQLite compiled without FTS5 — keep using the ILIKE fallback
+        print(f'[Search] FTS5 unavailable, using LIKE fallback: {e}')
+        return state
+
+    state['fts'] = True
+    return state
+
+
+def _populate(conn):
+    conn.execute(text("DELETE FROM product_fts"))
+    conn.execute(text(
+        "INSERT INTO product_fts(rowid, name, description, brand) "
+        "SELECT id, name, description, brand FROM product "
+        "WHERE COALESCE(is_deleted, 0) = 0"
+    ))
+
+
+def rebuild_index():
+    """Repopulate the FTS index from the product table."""
+    with db.engine.begin() as conn:
+        _populate(conn)
+        conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('optimize')"))
+
+
+def fts_enabled():
+    """Whether the FTS index exists; probed once per process, not at startup."""
+    state = current_app.extensions.get(EXT_KEY)
+    if state is None:
+        state = {'fts': _fts_table_exists()}
+        current_app.extensions[EXT_KEY] = state
+    return state['fts']
+
+
+def _fts_table_exists():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    with db.engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+        )).first() is not None
+
+
+def _match_expression(query):
+    """Turn free text into an FTS5 MATCH expression: every token as a prefix."""
+    tokens = _TOKEN_RE.findall(query)
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def search_products(query, limit=20):
+    """Return non-deleted products matching ``query``, best match first."""
+    if fts_enabled():
+        match = _match_expression(query)
+        if not match:
+            return []
+        try:
+            return _search_fts(match, limit)
+        except OperationalError as e:
+            current_app.logger.warning('FTS search failed, falling back: %s', e)
+            db.session.rollback()
+    return _search_like(query, limit)
+
+
+def _search_fts(match, limit):
+    w_name, w_desc, w_brand = BM25_WEIGHTS
+    stmt = text(
+        "SELECT product.* FROM product_fts "
+        "JOIN product ON product.id = product_fts.rowid "
+        "WHERE product_fts MATCH :match AND product.is_deleted = 0 "
+        f"ORDER BY bm25(product_fts, {w_name}, {w_desc}, {w_brand}), product.id DESC "
+        "LIMIT :limit"
+    )
+    return db.session.query(Product).from_statement(
+        stmt.bindparams(match=match, limit=limit)).all()
+
+
+def _search_like(query, limit):
+    pattern = f'%{query}%'
+    rank = db.case(
+        (Product.name.ilike(f'{query}%'), 0),
+        (Product.name.ilike(pattern), 1),
+        (Product.brand.ilike(pattern), 2),
+        else_=3,
+    )
+    return Product.query.filter(
+        Product.is_deleted == False,
+        db.or_(
+            Product.name.ilike(pattern),
+            Product.description.ilike(pattern),
+            Product.brand.ilike(pattern),
+        )
+    ).order_by(rank, Product.id.desc()).limit(limit).all()
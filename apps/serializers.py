@@ -0,0 +1,163 @@
+"""
+Schema-driven serialization for the hot JSON endpoints.
+
+A ``Schema`` declares a model's public fields once. List endpoints select
+only the columns they need, as tuples, so they skip ORM instances and
+``to_dict`` calls entirely. Converters are applied per field, and the payload
+is encoded straight to bytes. ``orjson`` is used when it is installed (it is
+an optional dependency); otherwise the stdlib encoder runs without key sorting.
+
+Clients may ask for a sparse fieldset with ``?fields=id,name,price``, or for
+a named projection with ``?view=card``. Either way the output keeps the
+schema's field order. List endpoints also accept ``?format=columnar``, which
+returns one array per field (``{"id": [..], "name": [..]}``) instead of one
+object per row. That shape is smaller to send and cheap for grid and carousel
+consumers to zip back together.
+"""
+import json
+
+from flask import abort, current_app, jsonify, make_response, request
+from models import Product, Category, BannerSlide
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _iso(value):
+    return value.isoformat()
+
+
+LIST_FORMATS = ('rows', 'columnar')
+
+
+class Schema:
+    def __init__(self, model, fields, convert=None, views=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.convert = convert or {}
+        self.views = views or {}
+
+    def parse_fields(self, raw, view=None):
+        """The requested subset of fields in schema order; all of them when
+        neither ``raw`` nor ``view`` is given. Explicit fields win over a view."""
+        if not raw and view:
+            if view not in self.views:
+                raise InvalidFields(f'Unknown view {view!r}. Use: {sorted(self.views)}')
+            raw = ','.join(self.views[view])
+        if not raw:
+            return self.fields
+        wanted = {f.strip() for f in raw.split(',') if f.strip()}
+        unknown = wanted.difference(self.fields)
+        if unknown:
+            raise InvalidFields(f'Unknown field(s): {", ".join(sorted(unknown))}')
+        return tuple(f for f in self.fields if f in wanted)
+
+    def query(self, query, fields=None, extra=()):
+        """Narrow an ORM query to the columns for ``fields``, followed by any
+        ``extra`` columns (e.g. sort keys) that the caller needs but won't emit."""
+        names = list(fields or self.fields)
+        names += [n for n in extra if n not in names]
+        return query.with_entities(*(getattr(self.model, n) for n in names))
+
+    def rows(self, rows, fields=None):
+        """Dicts from tuples selected by :meth:`query`."""
+        fields = fields or self.fields
+        width = len(fields)
+        conv = [(i, self.convert[f]) for i, f in enumerate(fields) if f in self.convert]
+        out = []
+        for row in rows:
+            values = row[:width]
+            if conv:
+                values = list(values)
+                for i, fn in conv:
+                    if values[i] is not None:
+                        values[i] = fn(values[i])
+            out.append(dict(zip(fields, values)))
+        return out
+
+    def columns(self, rows, fields=None):
+        """{field: [values]} from tuples selected by :meth:`query`."""
+        fields = fields or self.fields
+        cols = list(zip(*rows)) if rows else [()] * len(fields)
+        out = {}
+        for f, values in zip(fields, cols):
+            fn = self.convert.get(f)
+            out[f] = [fn(v) if v is not None else v for v in values] if fn else list(values)
+        return out
+
+    def tuples(self, objs, fields=None):
+        """Tuples from loaded instances, in the shape :meth:`query` selects."""
+        fields = fields or self.fields
+        return [tuple(getattr(o, f) for f in fields) for o in objs]
+
+    def all(self, query, fields=None):
+        return self.rows(self.query(query, fields).all(), fields)
+
+
+PRODUCT = Schema(Product, [
+    'id', 'sku', 'name', 'description', 'price', 'old_price', 'discount', 'is_discount',
+    'discount_price', 'discount_starts_at', 'discount_ends_at', 'effective_price', 'image',
+    'brand', 'stock', 'rating', 'rating_count', 'tag', 'is_featured', 'category_id',
+], convert={'discount_starts_at': _iso, 'discount_ends_at': _iso}, views={
+    # Product grid cards: no description or promotion internals
+    'card': ('id', 'name', 'price', 'old_price', 'effective_price', 'is_discount', 'image',
+             'rating', 'rating_count', 'tag', 'stock', 'category_id'),
+    # Sale carousel (DiscountCarousel.tsx)
+    'carousel': ('id', 'name', 'description', 'price', 'old_price', 'effective_price', 'image'),
+})
+
+CATEGORY = Schema(Category, ['id', 'name', 'slug', 'image_url', 'sort_order', 'is_active'])
+
+BANNER = Schema(BannerSlide, [
+    'id', 'title', 'subtitle', 'badge_text', 'badge_style', 'button_text', 'image_url',
+    'bg_gradient', 'sort_order',
+])
+
+
+def _bad_request(message):
+    abort(make_response(jsonify({'success': False, 'message': message}), 400))
+
+
+def requested_fields(schema):
+    """Fields from ``?fields=`` / ``?view=``; aborts with a JSON 400 on unknown names."""
+    try:
+        return schema.parse_fields(request.args.get('fields'), request.args.get('view'))
+    except InvalidFields as e:
+        _bad_request(str(e))
+
+
+def requested_format():
+    """List shape from ``?format=`` (rows by default); aborts with a JSON 400 otherwise."""
+    fmt = request.args.get('format', 'rows')
+    if fmt not in LIST_FORMATS:
+        _bad_request(f'Unknown format {fmt!r}. Use: {list(LIST_FORMATS)}')
+    return fmt
+
+
+def serialize_list(schema, rows, fields, fmt='rows'):
+    """Rows as a list of dicts, or as {field: [values]} for the columnar format."""
+    if fmt == 'columnar':
+        return schema.columns(rows, fields)
+    return schema.rows(rows, fields)
+
+
+# ─── Encoding ─────────────────────────────────────────────────────────────────
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(payload):
+    """Encode to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _encoder.encode(payload).encode()
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status,
+                                      mimetype='application/json')
@@ -0,0 +1,280 @@
+"""
+Materialized dashboard statistics.
+
+Counters live in the ``stat_counter`` table (key -> value). Writes that move
+a counter append their changes to ``stat_delta`` in the same transaction,
+from ORM flush events; a counter's value is its row plus its pending deltas.
+Appending never touches a shared row, so concurrent checkouts don't queue
+on the hot ``orders`` / ``status:pending`` / ``day:…`` counters.
+``flask stats-compact`` (cron, every few minutes) folds the deltas into
+``stat_counter`` so the read stays small.
+
+Counters:
+
+* ``products`` / ``categories`` / ``banners`` — live (not deleted / active) rows
+* ``users`` / ``ui_assets`` / ``orders``       — row counts
+* ``status:<status>``                          — orders per status
+* ``day:<YYYY-MM-DD>:orders`` / ``:revenue``   — orders and non-cancelled revenue per day
+
+Core bulk writes (imports, generators) bypass the events, so ``recount_stats``
+rebuilds every counter from scratch; bootstrap runs it, and ``flask
+stats-recount`` from cron reconciles any drift. The dashboard payload
+(counters plus the low-stock list) is one cached read, invalidated by a
+version file bumped after each commit that moved a counter, and by the
+inventory version for stock levels.
+"""
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, delete, event, func, insert, inspect, select, text, union_all
+from models import (db, StatCounter, StatDelta, Product, Category, BannerSlide, UIAsset,
+                    User, Order)
+from apps.cache import CachedBody, ContentVersion, get_cache
+
+EXT_KEY = 'dashboard_stats'
+
+# model -> (counter, flag attribute or None, flag value that counts)
+COUNTED = {
+    Product: ('products', 'is_deleted', False),
+    Category: ('categories', 'is_active', True),
+    BannerSlide: ('banners', 'is_active', True),
+    User: ('users', None, None),
+    UIAsset: ('ui_assets', None, None),
+}
+
+_UPSERT = text(
+    'INSERT INTO stat_counter (key, value) VALUES (:key, :delta) '
+    'ON CONFLICT (key) DO UPDATE SET value = stat_counter.value + excluded.value'
+)
+
+
+def init_stats(app):
+    os.makedirs(app.instance_path, exist_ok=True)
+    path = app.config.get('STATS_VERSION_FILE') or os.path.join(app.instance_path, 'stats.version')
+    version = ContentVersion(path)
+    if version.get() == 0:
+        version.bump()
+    app.extensions[EXT_KEY] = version
+    return version
+
+
+def _bump_stats_version():
+    version = current_app.extensions.get(EXT_KEY)
+    if version is not None:
+        version.bump()
+
+
+# ─── Incremental updates ──────────────────────────────────────────────────────
+def _old(obj, attr):
+    """Value of ``attr`` before this flush (the current one if unchanged)."""
+    hist = inspect(obj).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    return getattr(obj, attr)
+
+
+def _counts(flag_value, expected):
+    return expected is None or bool(flag_value) == expected
+
+
+def _day(created_at):
+    return (created_at or datetime.utcnow()).date().isoformat()
+
+
+def _order_deltas(deltas, status, total, created_at, sign):
+    day = _day(created_at)
+    deltas['orders'] = deltas.get('orders', 0) + sign
+    deltas[f'status:{status}'] = deltas.get(f'status:{status}', 0) + sign
+    deltas[f'day:{day}:orders'] = deltas.get(f'day:{day}:orders', 0) + sign
+    if status != 'cancelled':
+        deltas[f'day:{day}:revenue'] = deltas.get(f'day:{day}:revenue', 0) + sign * (total or 0)
+
+
+def _collect(session):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Order):
+            _order_deltas(deltas, obj.status, obj.total_amount, obj.created_at, 1)
+        elif type(obj) in COUNTED:
+            key, attr, expected = COUNTED[type(obj)]
+            if _counts(attr and getattr(obj, attr), expected):
+                deltas[key] = deltas.get(key, 0) + 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            _order_deltas(deltas, _old(obj, 'status'), _old(obj, 'total_amount'),
+                          obj.created_at, -1)
+        elif type(obj) in COUNTED:
+            key, attr, expected = COUNTED[type(obj)]
+            if _counts(attr and _old(obj, attr), expected):
+                deltas[key] = deltas.get(key, 0) - 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj).attrs
+            if state.status.history.has_changes() or state.total_amount.history.has_changes():
+                _order_deltas(deltas, _old(obj, 'status'), _old(obj, 'total_amount'),
+                              obj.created_at, -1)
+                _order_deltas(deltas, obj.status, obj.total_amount, obj.created_at, 1)
+        elif type(obj) in COUNTED:
+            key, attr, expected = COUNTED[type(obj)]
+            if attr is None or not inspect(obj).attrs[attr].history.has_changes():
+                continue
+            before = _counts(_old(obj, attr), expected)
+            after = _counts(getattr(obj, attr), expected)
+            if before != after:
+                deltas[key] = deltas.get(key, 0) + (1 if after else -1)
+    return {k: v for k, v in deltas.items() if v}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_counter_deltas(session, flush_context):
+    deltas = _collect(session)
+    if deltas:
+        session.connection().execute(
+            insert(StatDelta), [{'key': k, 'delta': v} for k, v in deltas.items()])
+        session.info['stats_dirty'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('stats_dirty', False):
+        _bump_stats_version()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('stats_dirty', None)
+
+
+# ─── Compaction / full recount ────────────────────────────────────────────────
+def compact_stats():
+    """Fold pending deltas into ``stat_counter``; returns the number folded.
+
+    Exactly the rows this DELETE removes are folded, so deltas committed
+    meanwhile are left for the next pass.
+    """
+    rows = db.session.execute(
+        delete(StatDelta).returning(StatDelta.key, StatDelta.delta)).all()
+    sums = {}
+    for key, delta in rows:
+        sums[key] = sums.get(key, 0) + delta
+    if sums:
+        db.session.execute(_UPSERT, [{'key': k, 'delta': v} for k, v in sums.items()])
+    db.session.commit()
+    return len(rows)
+
+
+def _recount():
+    counts = {
+        'products': select(func.count(Product.id)).where(Product.is_deleted == False),
+        'categories': select(func.count(Category.id)).where(Category.is_active == True),
+        'banners': select(func.count(BannerSlide.id)).where(BannerSlide.is_active == True),
+        'users': select(func.count(User.id)),
+        'ui_assets': select(func.count(UIAsset.id)),
+        'orders': select(func.count(Order.id)),
+    }
+    values = {key: db.session.scalar(stmt) or 0 for key, stmt in counts.items()}
+
+    for status, n in db.session.execute(
+            select(Order.status, func.count(Order.id)).group_by(Order.status)):
+        values[f'status:{status}'] = n
+
+    day = func.date(Order.created_at)
+    revenue = func.sum(case((Order.status != 'cancelled', Order.total_amount), else_=0))
+    for d, n, total in db.session.execute(
+            select(day, func.count(Order.id), revenue).group_by(day)):
+        if d is None:
+            continue
+        d = str(d)[:10]
+        values[f'day:{d}:orders'] = n
+        values[f'day:{d}:revenue'] = total or 0
+    return values
+
+
+def recount_stats():
+    """Rebuild every counter from the source tables; returns the keys that had drifted.
+
+    One transaction on the writer: pending deltas are deleted first, so the
+    recount reads share that connection (and, on SQLite, its write lock) and
+    no delta can be committed between the recount and the reset.
+    """
+    pending = db.session.execute(
+        delete(StatDelta).returning(StatDelta.key, StatDelta.delta)).all()
+    stored = dict(db.session.execute(select(StatCounter.key, StatCounter.value)).all())
+    for key, delta in pending:
+        stored[key] = stored.get(key, 0) + delta
+    fresh = _recount()
+    drifted = sorted(k for k in fresh.keys() | stored.keys()
+                     if round(fresh.get(k, 0), 2) != round(stored.get(k, 0), 2))
+
+    db.session.execute(delete(StatCounter))
+    db.session.execute(insert(StatCounter), [{'key': k, 'value': v} for k, v in fresh.items()])
+    db.session.commit()
+    _bump_stats_version()
+    return drifted
+
+
+# ─── Dashboard payload ────────────────────────────────────────────────────────
+def _current_counters(since=None):
+    """SELECT key, value: each counter's row plus its pending deltas.
+
+    ``since`` (a date) leaves out the per-day counters before it.
+    """
+    rows = union_all(select(StatCounter.key, StatCounter.value),
+                     select(StatDelta.key, StatDelta.delta)).subquery()
+    stmt = select(rows.c.key, func.sum(rows.c.value)).group_by(rows.c.key)
+    if since is not None:
+        stmt = stmt.where(db.or_(~rows.c.key.like('day:%'),
+                                 rows.c.key >= f'day:{since.isoformat()}'))
+    return stmt
+
+
+def _build_dashboard():
+    days = current_app.config.get('STATS_REVENUE_DAYS', 30)
+    threshold = current_app.config.get('LOW_STOCK_THRESHOLD', 5)
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+
+    # Counters start at the bootstrap recount; a GET never writes
+    counters = dict(db.session.execute(_current_counters(since=first_day)).all())
+
+    revenue_by_day = []
+    for n in range(days):
+        d = (first_day + timedelta(days=n)).isoformat()
+        revenue_by_day.append({
+            'date': d,
+            'orders': int(counters.get(f'day:{d}:orders', 0)),
+            'revenue': round(counters.get(f'day:{d}:revenue', 0), 2),
+        })
+
+    low_stock = db.session.execute(
+        select(Product.id, Product.name, Product.stock)
+        .where(Product.is_deleted == False, Product.stock <= threshold)
+        .order_by(Product.stock, Product.id).limit(20)).all()
+
+    return {
+        'success': True,
+        'stats': {
+            **{key: int(counters.get(key, 0)) for key, _, _ in COUNTED.values()},
+            'orders': int(counters.get('orders', 0)),
+            'orders_by_status': {k.split(':', 1)[1]: int(v) for k, v in counters.items()
+                                 if k.startswith('status:') and v},
+            'revenue_by_day': revenue_by_day,
+            'low_stock_threshold': threshold,
+            'low_stock': [{'id': r.id, 'name': r.name, 'stock': r.stock} for r in low_stock],
+        },
+    }
+
+
+def dashboard_response():
+    """The admin dashboard JSON, served from the response cache when unchanged."""
+    cache = get_cache()
+    version = (current_app.extensions[EXT_KEY].get(), *cache.current_version(inventory=True),
+               datetime.utcnow().date().toordinal())
+    body = cache.get('admin:stats', version)
+    if body is None:
+        body = CachedBody(current_app.json.dumps(_build_dashboard(), separators=(',', ':')).encode())
+        cache.set('admin:stats', version, body)
+    return current_app.response_class(body, mimetype='application/json')
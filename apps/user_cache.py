@@ -0,0 +1,110 @@
+"""
+Signed-in user cache.
+
+Flask-Login calls ``load_user`` on every request from a signed-in client.
+Instead of loading the User row each time, the loader returns a
+``UserSnapshot`` (id, username, email, is_admin) from a per-process LRU with
+a short TTL. The user id itself comes from the signed session cookie.
+
+Entries are tagged with the *users version*, a file mtime in the instance
+folder bumped after any commit that updates or deletes a User. A demotion or
+password change therefore reaches every worker on its next request, while
+registrations (inserts) leave existing entries alone. Writes that bypass the
+ORM should call ``bump_users_version()``.
+
+Routes that need the real row (admin pages, account changes) call
+``load_full_user()``; admin access is re-checked against it.
+"""
+import os
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin, current_user
+from sqlalchemy import event, select
+from models import db, User
+from apps.cache import ContentVersion, ResponseCache
+
+EXT_KEY = 'user_cache'
+
+
+class UserSnapshot(UserMixin):
+    """The identity fields of a User, detached from any session."""
+
+    __slots__ = ('id', 'username', 'email', 'is_admin')
+
+    def __init__(self, id, username, email, is_admin):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = bool(is_admin)
+
+
+def init_user_cache(app):
+    os.makedirs(app.instance_path, exist_ok=True)
+    path = app.config.get('USERS_VERSION_FILE') or os.path.join(app.instance_path, 'users.version')
+    version = ContentVersion(path)
+    if version.get() == 0:
+        version.bump()
+    cache = ResponseCache(version, None,
+                          max_entries=app.config.get('USER_CACHE_SIZE', 1024),
+                          ttl=app.config.get('USER_CACHE_TTL', 60))
+    app.extensions[EXT_KEY] = cache
+    return cache
+
+
+def bump_users_version():
+    """Invalidate cached users in every worker."""
+    if has_app_context() and EXT_KEY in current_app.extensions:
+        current_app.extensions[EXT_KEY].version.bump()
+
+
+def load_user_snapshot(user_id):
+    """Flask-Login user loader: a cached snapshot, or None for unknown ids."""
+    try:
+        uid = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cache = current_app.extensions[EXT_KEY]
+    version = cache.current_version()
+    snapshot = cache.get(uid, version)
+    if snapshot is None:
+        row = db.session.execute(
+            select(User.id, User.username, User.email, User.is_admin).where(User.id == uid)
+        ).first()
+        if row is None:
+            return None
+        snapshot = UserSnapshot(*row)
+        cache.set(uid, version, snapshot)
+    return snapshot
+
+
+def load_full_user():
+    """The signed-in user's row (None when anonymous or since deleted)."""
+    if not current_user.is_authenticated:
+        return None
+    return db.session.get(User, current_user.id)
+
+
+# ─── Invalidation on commit ───────────────────────────────────────────────────
+@event.listens_for(db.session, 'after_flush')
+def _track_user_writes(session, flush_context):
+    if session.info.get('users_dirty'):
+        return
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            session.info['users_dirty'] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            session.info['users_dirty'] = True
+            return
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('users_dirty', False):
+        bump_users_version()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('users_dirty', None)
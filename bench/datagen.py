@@ -0,0 +1,154 @@
+"""
+Synthetic catalog generator for benchmarks.
+
+Bulk-inserts categories, products, users, orders and carts at a chosen scale
+with Core executemany batches. Deterministic for a given ``seed``. Must run
+inside an app context on a bootstrapped database (see bootstrap.py).
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+from models import db, User, Category, Product, CartItem, Order, OrderItem
+from apps.pricing import effective_price
+from apps.stats import recount_stats
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+BATCH = 5_000
+
+BRANDS = ['Apple', 'Samsung', 'Sony', 'Dell', 'Lenovo', 'Asus', 'Acer', 'HP', 'LG',
+          'Xiaomi', 'Google', 'Bose', 'JBL', 'Canon', 'Nikon', 'Garmin', 'Philips', 'Logitech']
+NOUNS = ['Phone', 'Laptop', 'Watch', 'Headphones', 'Tablet', 'Console', 'Camera', 'Speaker',
+         'Monitor', 'Keyboard', 'Mouse', 'Router', 'Drone', 'Projector', 'Earbuds', 'Charger']
+ADJECTIVES = ['Pro', 'Max', 'Ultra', 'Lite', 'Mini', 'Plus', 'Air', 'Neo', 'Prime', 'Edge']
+FEATURES = ['noise cancelling', 'OLED display', 'fast charging', 'wireless', '4K HDR',
+            'titanium body', 'long battery life', 'water resistant', 'AI assistant', 'USB-C']
+TAGS = [None, None, None, 'new', 'sale', 'hot', 'stock']
+
+# Words guaranteed to appear in generated names, for search scenarios
+SEARCH_TERMS = BRANDS + NOUNS + ADJECTIVES
+
+
+def parse_scale(value):
+    value = str(value).lower()
+    return SCALES.get(value) or int(value)
+
+
+def _batches(rows, size=BATCH):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _insert(model, rows):
+    for chunk in _batches(rows):
+        db.session.execute(insert(model), chunk)
+
+
+def generate(products=10_000, users=None, orders=None, carts=None, seed=42, log=print):
+    """Populate the current database; sizes for users/orders/carts scale with products."""
+    rnd = random.Random(seed)
+    users = users if users is not None else max(100, products // 20)
+    orders = orders if orders is not None else max(100, products // 5)
+    carts = carts if carts is not None else max(100, products // 10)
+
+    # ── Categories ────────────────────────────────────────────────────────────
+    base_cat = db.session.scalar(select(func.count(Category.id))) or 0
+    _insert(Category, [
+        {'name': f'Bench {n}', 'slug': f'bench-{base_cat + i}', 'sort_order': 100 + i,
+         'is_active': True}
+        for i, n in enumerate(NOUNS)
+    ])
+    cat_ids = db.session.scalars(select(Category.id)).all()
+
+    # ── Products ──────────────────────────────────────────────────────────────
+    log(f'[bench] generating {products} products')
+    now = datetime.utcnow()
+    rows = []
+    for i in range(products):
+        price = round(rnd.uniform(9, 3000), 2)
+        is_discount = rnd.random() < 0.15
+        old_price = round(price * rnd.uniform(1.1, 1.5), 2) if is_discount else None
+        rows.append({
+            'name': f'{rnd.choice(BRANDS)} {rnd.choice(NOUNS)} {rnd.choice(ADJECTIVES)} {i}',
+            'description': ', '.join(rnd.sample(FEATURES, 3)),
+            'price': price,
+            'old_price': old_price,
+            'discount': round((1 - price / old_price) * 100) if old_price else 0,
+            'is_discount': is_discount,
+            'effective_price': effective_price(price, old_price, 0, is_discount),
+            'brand': rnd.choice(BRANDS),
+            'stock': rnd.randint(100, 10_000),
+            'rating': round(rnd.uniform(3, 5), 1),
+            'rating_count': rnd.randint(0, 5000),
+            'tag': rnd.choice(TAGS),
+            'is_featured': rnd.random() < 0.01,
+            'is_deleted': rnd.random() < 0.02,
+            'category_id': rnd.choice(cat_ids),
+            'created_at': now - timedelta(minutes=products - i),
+        })
+        if len(rows) >= BATCH:
+            _insert(Product, rows)
+            rows = []
+    _insert(Product, rows)
+    db.session.commit()
+    product_ids = db.session.scalars(
+        select(Product.id).where(Product.is_deleted == False)).all()
+    prices = dict(db.session.execute(select(Product.id, Product.effective_price)).all())
+
+    # ── Users ─────────────────────────────────────────────────────────────────
+    log(f'[bench] generating {users} users')
+    pw_hash = generate_password_hash('bench-password')
+    tag = f'{rnd.getrandbits(24):06x}'
+    _insert(User, [
+        {'username': f'bench_{tag}_{i}', 'email': None, 'password_hash': pw_hash,
+         'is_admin': False, 'created_at': now}
+        for i in range(users)
+    ])
+    db.session.commit()
+    user_ids = db.session.scalars(
+        select(User.id).where(User.username.like(f'bench_{tag}_%'))).all()
+
+    # ── Orders ────────────────────────────────────────────────────────────────
+    log(f'[bench] generating {orders} orders')
+    statuses = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+    next_order = (db.session.scalar(select(func.max(Order.id))) or 0) + 1
+    order_rows, line_rows = [], []
+    for n in range(orders):
+        oid = next_order + n
+        lines = [(rnd.choice(product_ids), rnd.randint(1, 3)) for _ in range(rnd.randint(1, 5))]
+        order_rows.append({
+            'id': oid, 'user_id': rnd.choice(user_ids),
+            'total_amount': round(sum(prices[p] * q for p, q in lines), 2),
+            'status': rnd.choice(statuses),
+            'created_at': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365)),
+        })
+        line_rows.extend({'order_id': oid, 'product_id': p, 'quantity': q,
+                          'price_at_purchase': prices[p]} for p, q in lines)
+        if len(order_rows) >= BATCH:
+            _insert(Order, order_rows)
+            _insert(OrderItem, line_rows)
+            order_rows, line_rows = [], []
+    _insert(Order, order_rows)
+    _insert(OrderItem, line_rows)
+    db.session.commit()
+
+    # ── Carts (half signed-in, half anonymous) ───────────────────────────────
+    log(f'[bench] generating {carts} carts')
+    cart_rows, seen = [], set()
+    for n in range(carts):
+        owner = ({'user_id': rnd.choice(user_ids), 'session_id': None} if n % 2
+                 else {'user_id': None, 'session_id': str(uuid.UUID(int=rnd.getrandbits(128)))})
+        for pid in rnd.sample(product_ids, rnd.randint(1, 4)):
+            key = (owner['user_id'], owner['session_id'], pid)
+            if key in seen:
+                continue
+            seen.add(key)
+            cart_rows.append({**owner, 'product_id': pid, 'quantity': rnd.randint(1, 3)})
+    _insert(CartItem, cart_rows)
+    db.session.commit()
+    recount_stats()
+
+    return {'products': products, 'users': users, 'orders': orders, 'carts': carts}
@@ -0,0 +1,342 @@
+"""
+Storefront / admin load benchmark.
+
+Builds (or reuses) a synthetic database, replays a weighted traffic mix from
+concurrent virtual users, and reports throughput and p50/p95/p99 latency per
+endpoint. Results can be saved as a JSON baseline and later runs compared
+against it; a regression beyond ``--tolerance`` exits non-zero.
+
+    python -m bench.run --scale 10k --duration 30 --users 8 --out bench/baseline.json
+    python -m bench.run --scale 10k --baseline bench/baseline.json
+    python -m bench.run --scale 100k --gunicorn 2          # real workers over HTTP
+    python -m bench.run --url http://127.0.0.1:8000        # an already running server
+
+In-process mode drives the Flask app through its test client, so it
+measures application + database cost without a network stack.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+# ─── Clients ──────────────────────────────────────────────────────────────────
+class InProcessClient:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None):
+        resp = self._client.open(path, method=method, json=body)
+        data = resp.get_data()
+        return resp.status_code, data
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self._opener.open(req, timeout=30) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+# ─── Traffic Mix ──────────────────────────────────────────────────────────────
+class VirtualUser:
+    """One shopper with its own cookie jar, recording every request it makes."""
+
+    def __init__(self, client, ctx, rnd, record):
+        self.client = client
+        self.ctx = ctx
+        self.rnd = rnd
+        self.record = record
+        self.cart = []
+
+    def call(self, name, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, body)
+        except Exception:
+            status, data = 0, b''
+        self.record(name, time.perf_counter() - start, status)
+        if status == 200 and data[:1] == b'{':
+            try:
+                return json.loads(data)
+            except ValueError:
+                pass
+        return None
+
+    def homepage(self):
+        self.call('GET /', 'GET', '/')
+        self.call('GET /api/ui-config', 'GET', '/api/ui-config')
+        self.call('GET /api/categories', 'GET', '/api/categories')
+        self.call('GET /api/banners', 'GET', '/api/banners')
+        self.call('GET /api/products?featured', 'GET', '/api/products?featured=1&per_page=8')
+        self.call('GET /api/products/sale', 'GET', '/api/products/sale?per_page=12')
+
+    def search(self):
+        term = self.rnd.choice(self.ctx['terms'])
+        # Type-ahead: the prefix grows keystroke by keystroke
+        for n in range(2, min(len(term), 5) + 1):
+            self.call('GET /api/products/search', 'GET',
+                      f'/api/products/search?q={term[:n]}')
+
+    def browse(self):
+        sort = self.rnd.choice(['newest', 'price_asc', 'price_desc', 'rating'])
+        cat = self.rnd.choice(self.ctx['categories'])
+        if self.rnd.random() < 0.5:
+            page = self.rnd.choice([1, 2, 3, 10, 50, 200])
+            self.call('GET /api/products?page', 'GET',
+                      f'/api/products?sort={sort}&category_id={cat}&page={page}')
+        else:
+            cursor = ''
+            for _ in range(self.rnd.randint(1, 5)):
+                data = self.call('GET /api/products?cursor', 'GET',
+                                 f'/api/products?sort={sort}&cursor={cursor}')
+                cursor = data and data.get('next_cursor')
+                if not cursor:
+                    break
+
+    def product(self):
+        pid = self.rnd.choice(self.ctx['products'])
+        self.call('GET /api/products/<id>', 'GET', f'/api/products/{pid}')
+
+    def add_to_cart(self):
+        pid = self.rnd.choice(self.ctx['products'])
+        self.call('POST /api/cart', 'POST', '/api/cart', {'product_id': pid, 'quantity': 1})
+        self.call('GET /api/cart', 'GET', '/api/cart')
+
+    def checkout(self):
+        self.add_to_cart()
+        self.call('POST /api/checkout', 'POST', '/api/checkout')
+
+
+MIX = [
+    ('homepage', 30),
+    ('browse', 25),
+    ('search', 15),
+    ('product', 15),
+    ('add_to_cart', 10),
+    ('checkout', 5),
+]
+
+
+# ─── Stats ────────────────────────────────────────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def __call__(self, name, seconds, status):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if status >= 400 or status == 0:
+                self.errors[name] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def summarize(recorder, elapsed):
+    report = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values.sort()
+        report[name] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+        }
+    return report
+
+
+def print_report(report, elapsed):
+    total = sum(r['requests'] for r in report.values())
+    print(f'\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)\n')
+    print(f'{"endpoint":34} {"reqs":>7} {"err":>5} {"rps":>8} {"p50":>9} {"p95":>9} {"p99":>9}')
+    for name, r in report.items():
+        print(f'{name:34} {r["requests"]:7d} {r["errors"]:5d} {r["rps"]:8.1f} '
+              f'{r["p50_ms"]:8.2f}m {r["p95_ms"]:8.2f}m {r["p99_ms"]:8.2f}m')
+
+
+def compare(report, baseline, tolerance):
+    """Return the regressions of ``report`` against ``baseline`` as messages."""
+    problems = []
+    for name, base in baseline.get('endpoints', {}).items():
+        cur = report.get(name)
+        if cur is None:
+            continue
+        if base['p95_ms'] and cur['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            problems.append(f'{name}: p95 {cur["p95_ms"]:.2f}ms vs baseline {base["p95_ms"]:.2f}ms')
+        if base['rps'] and cur['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f'{name}: {cur["rps"]:.1f} req/s vs baseline {base["rps"]:.1f}')
+    return problems
+
+
+# ─── Setup ────────────────────────────────────────────────────────────────────
+def build_app(db_path, scale, seed):
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(db_path)}'
+    fresh = not os.path.exists(db_path)
+    from app import create_app
+    from bootstrap import run_bootstrap
+    app = create_app()
+    run_bootstrap(app)
+    if fresh:
+        from bench.datagen import generate
+        with app.app_context():
+            started = time.perf_counter()
+            generate(products=scale, seed=seed)
+            print(f'[bench] dataset ready in {time.perf_counter() - started:.1f}s')
+    return app
+
+
+def load_context(app):
+    from sqlalchemy import select
+    from models import db, Product, Category
+    from bench.datagen import SEARCH_TERMS
+    with app.app_context():
+        products = db.session.scalars(
+            select(Product.id).where(Product.is_deleted == False).limit(50_000)).all()
+        categories = db.session.scalars(select(Category.id)).all()
+    return {'products': products, 'categories': categories,
+            'terms': [t.lower() for t in SEARCH_TERMS]}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(db_path, workers):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.abspath(db_path)}')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:create_app()', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=ROOT, env=env)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + '/api/categories', timeout=1).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def run(make_client, ctx, users, duration, seed):
+    recorder = Recorder()
+    names = [name for name, _ in MIX]
+    weights = [w for _, w in MIX]
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rnd = random.Random(seed + n)
+        vu = VirtualUser(make_client(), ctx, rnd, recorder)
+        while time.perf_counter() < deadline:
+            getattr(vu, rnd.choices(names, weights)[0])()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return summarize(recorder, elapsed), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', default='10k', help='products: 10k, 100k, 1m or a number')
+    parser.add_argument('--db', help='SQLite file (default: bench/data/bench-<scale>.db)')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of traffic')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS',
+                        help='serve the app with gunicorn and drive it over HTTP')
+    parser.add_argument('--url', help='benchmark an already running server instead')
+    parser.add_argument('--out', help='write the JSON report (usable as a baseline)')
+    parser.add_argument('--baseline', help='compare against a previous JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed regression vs baseline (fraction, default 0.15)')
+    args = parser.parse_args(argv)
+
+    from bench.datagen import parse_scale
+    scale = parse_scale(args.scale)
+    db_path = args.db or os.path.join(ROOT, 'bench', 'data', f'bench-{scale}.db')
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    app = build_app(db_path, scale, args.seed)
+    ctx = load_context(app)
+
+    proc = None
+    if args.url:
+        mode, make_client = 'http', (lambda: HttpClient(args.url))
+    elif args.gunicorn:
+        proc, url = start_gunicorn(db_path, args.gunicorn)
+        mode, make_client = f'gunicorn x{args.gunicorn}', (lambda: HttpClient(url))
+    else:
+        mode, make_client = 'in-process', (lambda: InProcessClient(app))
+
+    print(f'[bench] {mode}, {scale} products, {args.users} users, {args.duration:.0f}s')
+    try:
+        report, elapsed = run(make_client, ctx, args.users, args.duration, args.seed)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print_report(report, elapsed)
+    result = {
+        'mode': mode, 'scale': scale, 'users': args.users,
+        'duration_s': round(elapsed, 2), 'endpoints': report,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'\n[bench] report written to {args.out}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        if problems:
+            print('\nRegressions against baseline:')
+            for p in problems:
+                print(f'  - {p}')
+            return 1
+        print('\nNo regressions against baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Bootstrap script — prepares the database once per deploy, before workers start.
+Creates/upgrades the schema, installs the search index, backfills effective
+prices, seeds an empty database and rebuilds the dashboard counters.
+Safe to run repeatedly.
+Run via: python bootstrap.py  OR  flask bootstrap  (Procfile ``release`` phase)
+"""
+import os
+import time
+
+
+def run_bootstrap(app, seed=True, log=print):
+    """Run every one-shot database step; returns the elapsed time in ms."""
+    from models import db, User
+    from models.schema import upgrade_schema
+    from apps.search import init_search
+    from apps.pricing import reprice_products
+    from apps.stats import recount_stats
+
+    started = time.perf_counter()
+    with app.app_context():
+        # create_all() plus additive columns/indexes for databases created
+        # by an older version of the models
+        added, created = upgrade_schema()
+        if added or created:
+            log(f'[Bootstrap] Schema upgraded: {len(added)} column(s), {len(created)} index(es).')
+
+        init_search(app)
+
+        # Backfill effective prices for rows written before the column existed
+        reprice_products(only_missing=True)
+
+        # Seed only if the database (User table) is truly empty
+        if seed and db.session.query(User.id).first() is None:
+            from seed import run_seed
+            run_seed()
+            log('[Bootstrap] Seeded empty database.')
+
+        # Reconcile the dashboard counters (first run, or writes made outside the ORM)
+        recount_stats()
+    return (time.perf_counter() - started) * 1000
+
+
+if __name__ == '__main__':
+    # The factory must not bootstrap on its own here; this script does it once
+    os.environ['AUTO_BOOTSTRAP'] = '0'
+    from app import create_app
+    elapsed = run_bootstrap(create_app())
+    print(f'[Bootstrap] Done in {elapsed:.0f}ms.')
@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, selectinload
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from models.session import RoutingSession
 
-db = SQLAlchemy()
+# Reads may run on a separate read-only pool (see models/session.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 # ─── Users ───────────────────────────────────────────────────────────────────
@@ -24,6 +27,9 @@ class User(db.Model, UserMixin):
 
 # ─── Brute-Force Protection ───────────────────────────────────────────────────
 class LoginAttempt(db.Model):
+    __table_args__ = (
+        db.Index('ix_login_attempt_ip_username', 'ip_address', 'username'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     ip_address = db.Column(db.String(50), nullable=False)
     username = db.Column(db.String(150), nullable=True)
@@ -34,6 +40,9 @@ class LoginAttempt(db.Model):
 
 # ─── Categories ──────────────────────────────────────────────────────────────
 class Category(db.Model):
+    __table_args__ = (
+        db.Index('ix_category_active_sort', 'is_active', 'sort_order'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     slug = db.Column(db.String(100), unique=True, nullable=False)
@@ -55,7 +64,23 @@ class Category(db.Model):
 
 # ─── Products ─────────────────────────────────────────────────────────────────
 class Product(db.Model):
+    # Each index mirrors a listing shape in apps/main.py and apps/admin.py:
+    # live products, an optional equality filter, ordered by the sort key + id.
+    __table_args__ = (
+        db.Index('ix_product_live', 'is_deleted', 'id'),
+        db.Index('ix_product_live_category', 'is_deleted', 'category_id', 'id'),
+        db.Index('ix_product_live_featured', 'is_deleted', 'is_featured', 'id'),
+        db.Index('ix_product_live_discount', 'is_deleted', 'is_discount', 'id'),
+        db.Index('ix_product_live_tag', 'is_deleted', 'tag', 'id'),
+        db.Index('ix_product_live_effective_price', 'is_deleted', 'effective_price', 'id'),
+        db.Index('ix_product_category_live_price', 'category_id', 'is_deleted',
+                 'effective_price', 'id'),
+        db.Index('ix_product_live_rating', 'is_deleted', 'rating', 'id'),
+        db.Index('ix_product_live_stock', 'is_deleted', 'stock', 'id'),
+        db.Index('ux_product_sku', 'sku', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), nullable=True)  # supplier key, used by bulk imports
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=False)
@@ -63,6 +88,9 @@ class Product(db.Model):
     discount = db.Column(db.Float, default=0.0)
     is_discount = db.Column(db.Boolean, default=False)
     discount_price = db.Column(db.Float, nullable=True)
+    discount_starts_at = db.Column(db.DateTime, nullable=True)
+    discount_ends_at = db.Column(db.DateTime, nullable=True)
+    effective_price = db.Column(db.Float, nullable=True)  # maintained by apps/pricing.py
     image = db.Column(db.String(500), nullable=True)
     brand = db.Column(db.String(100), nullable=True)
     stock = db.Column(db.Integer, default=10)
@@ -77,6 +105,7 @@ class Product(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'sku': self.sku,
             'name': self.name,
             'description': self.description,
             'price': self.price,
@@ -84,6 +113,9 @@ class Product(db.Model):
             'discount': self.discount,
             'is_discount': self.is_discount,
             'discount_price': self.discount_price,
+            'discount_starts_at': self.discount_starts_at.isoformat() if self.discount_starts_at else None,
+            'discount_ends_at': self.discount_ends_at.isoformat() if self.discount_ends_at else None,
+            'effective_price': self.effective_price,
             'image': self.image,
             'brand': self.brand,
             'stock': self.stock,
@@ -97,21 +129,34 @@ class Product(db.Model):
 
 # ─── Cart ─────────────────────────────────────────────────────────────────────
 class CartItem(db.Model):
+    __table_args__ = (
+        # One line per (owner, product): cart writes upsert against these
+        db.Index('ux_cart_item_user_product', 'user_id', 'product_id', unique=True),
+        db.Index('ux_cart_item_session_product', 'session_id', 'product_id', unique=True),
+        # Guest-cart expiry scan (user_id IS NULL AND updated_at < cutoff)
+        db.Index('ix_cart_item_user_updated', 'user_id', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     session_id = db.Column(db.String(150), nullable=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, default=1)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)  # guest-cart TTL
     product = db.relationship('Product', backref='cart_items')
 
 
 # ─── Orders ───────────────────────────────────────────────────────────────────
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_created_at', 'created_at'),
+        db.Index('ux_order_idempotency_key', 'idempotency_key', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     session_id = db.Column(db.String(150), nullable=True)
     total_amount = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(50), default='pending')  # pending, processing, shipped, delivered
+    idempotency_key = db.Column(db.String(64), nullable=True)  # client-supplied, dedupes retried checkouts
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('OrderItem', backref='order', lazy=True)
     user = db.relationship('User', backref='orders')
@@ -128,6 +173,9 @@ class Order(db.Model):
 
 
 class OrderItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_item_order', 'order_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -144,8 +192,18 @@ class OrderItem(db.Model):
         }
 
 
+# ─── Loader Profiles ──────────────────────────────────────────────────────────
+# Query options for endpoints that serialize relationships; pass them to
+# .options(*PROFILE) so a listing costs a fixed number of queries.
+CART_WITH_PRODUCT = (joinedload(CartItem.product),)
+ORDER_WITH_LINES = (selectinload(Order.items).joinedload(OrderItem.product),)
+
+
 # ─── Banner Slides ────────────────────────────────────────────────────────────
 class BannerSlide(db.Model):
+    __table_args__ = (
+        db.Index('ix_banner_slide_active_sort', 'is_active', 'sort_order'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     subtitle = db.Column(db.String(300), nullable=True)
@@ -171,6 +229,22 @@ class BannerSlide(db.Model):
         }
 
 
+# ─── Dashboard Counters ───────────────────────────────────────────────────────
+class StatCounter(db.Model):
+    """Materialized dashboard counter, maintained by apps/stats.py."""
+    __tablename__ = 'stat_counter'
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+
+class StatDelta(db.Model):
+    """Counter change appended by a write; folded into StatCounter by apps/stats.py."""
+    __tablename__ = 'stat_delta'
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False)
+    delta = db.Column(db.Float, nullable=False)
+
+
 # ─── UI Assets (Dynamic CMS) ─────────────────────────────────────────────────
 class UIAsset(db.Model):
     __tablename__ = 'ui_asset'
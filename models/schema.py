@@ -0,0 +1,173 @@
+"""
+Schema maintenance for databases created before the current models.
+
+``db.create_all()`` only creates missing tables, so columns and indexes
+added to existing models never reach old databases. Everything here is
+idempotent and safe to run on every deploy; only additive, nullable (or
+defaulted) columns are supported.
+"""
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from models import db, Product, CartItem, Order, OrderItem, LoginAttempt, Category, BannerSlide
+
+# Indexes that used to be declared on the models and have been replaced
+OBSOLETE_INDEXES = [
+    'ix_product_live_price',
+    'ix_cart_item_user_product',     # now unique (ux_)
+    'ix_cart_item_session_product',
+]
+
+# Unique indexes added to existing tables: (table, columns, summed column).
+# Duplicate rows are merged into the oldest one before the index is built.
+UNIQUE_MERGES = {
+    'ux_cart_item_user_product': ('cart_item', ('user_id', 'product_id'), 'quantity'),
+    'ux_cart_item_session_product': ('cart_item', ('session_id', 'product_id'), 'quantity'),
+}
+
+
+def upgrade_schema(engine=None):
+    """Bring an existing database up to the current models.
+
+    Returns (added columns, created indexes).
+    """
+    engine = engine or db.engine
+    db.metadata.create_all(bind=engine)
+    return ensure_columns(engine), ensure_indexes(engine)
+
+
+def ensure_columns(engine=None):
+    """ALTER TABLE ADD COLUMN for every model column the database lacks.
+
+    Returns the added columns as 'table.column'.
+    """
+    engine = engine or db.engine
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                table_name = conn.dialect.identifier_preparer.format_table(table)
+                conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {ddl}'))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def ensure_indexes(engine=None):
+    """Create every index declared on the models that the database lacks.
+
+    Returns the names of the indexes that were created.
+    """
+    engine = engine or db.engine
+    created = []
+    with engine.begin() as conn:
+        existing = _existing_indexes(conn)
+        for name in OBSOLETE_INDEXES:
+            if name in existing:
+                conn.execute(text(f'DROP INDEX {name}'))
+        for table in db.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if index.name in existing:
+                    continue
+                if index.name in UNIQUE_MERGES:
+                    _merge_duplicates(conn, *UNIQUE_MERGES[index.name])
+                index.create(bind=conn, checkfirst=True)
+                created.append(index.name)
+    return created
+
+
+def _merge_duplicates(conn, table, columns, summed):
+    """Fold rows sharing ``columns`` (none NULL) into the lowest id, summing ``summed``."""
+    key = ' AND '.join(f'd.{c} = {table}.{c}' for c in columns)
+    not_null = ' AND '.join(f'{c} IS NOT NULL' for c in columns)
+    keep = (f'SELECT MIN(id) FROM {table} WHERE {not_null} '
+            f'GROUP BY {", ".join(columns)} HAVING COUNT(*) > 1')
+    conn.execute(text(
+        f'UPDATE {table} SET {summed} = (SELECT SUM(d.{summed}) FROM {table} d WHERE {key}) '
+        f'WHERE id IN ({keep})'))
+    conn.execute(text(
+        f'DELETE FROM {table} WHERE {not_null} AND id NOT IN '
+        f'(SELECT MIN(id) FROM {table} WHERE {not_null} GROUP BY {", ".join(columns)})'))
+
+
+def _existing_indexes(conn):
+    """Names of the indexes already in the database, on any dialect."""
+    inspector = inspect(conn)
+    return {index['name'] for table in inspector.get_table_names()
+            for index in inspector.get_indexes(table) if index['name']}
+
+
+def hot_queries():
+    """The query shapes that must stay index-backed, as (name, statement)."""
+    P = Product
+    live = P.is_deleted == False
+    return [
+        ('products newest', select(P).where(live).order_by(P.id.desc()).limit(12)),
+        ('products by category', select(P).where(live, P.category_id == 1)
+            .order_by(P.id.desc()).limit(12)),
+        ('products featured', select(P).where(live, P.is_featured == True)
+            .order_by(P.id.desc()).limit(12)),
+        ('products by tag', select(P).where(live, P.tag == 'new')
+            .order_by(P.id.desc()).limit(12)),
+        ('products on sale', select(P).where(live, P.is_discount == True)
+            .order_by(P.id.desc()).limit(12)),
+        ('products price asc', select(P).where(live)
+            .order_by(P.effective_price.asc(), P.id.asc()).limit(12)),
+        ('products price desc', select(P).where(live)
+            .order_by(P.effective_price.desc(), P.id.desc()).limit(12)),
+        ('products by category price asc', select(P).where(live, P.category_id == 1)
+            .order_by(P.effective_price.asc(), P.id.asc()).limit(12)),
+        ('products by category price desc', select(P).where(live, P.category_id == 1)
+            .order_by(P.effective_price.desc(), P.id.desc()).limit(12)),
+        ('products rating', select(P).where(live)
+            .order_by(P.rating.desc(), P.id.desc()).limit(12)),
+        ('products low stock', select(P.id, P.name, P.stock).where(live, P.stock <= 5)
+            .order_by(P.stock, P.id).limit(20)),
+        ('product by sku', select(P.id).where(P.sku.in_(['SKU-1', 'SKU-2']))),
+        ('categories active', select(Category).where(Category.is_active == True)
+            .order_by(Category.sort_order)),
+        ('banners active', select(BannerSlide).where(BannerSlide.is_active == True)
+            .order_by(BannerSlide.sort_order)),
+        ('cart by user', select(CartItem).where(CartItem.user_id == 1)),
+        ('cart by session', select(CartItem).where(CartItem.session_id == 'sid')),
+        ('cart line lookup', select(CartItem).where(
+            CartItem.product_id == 1, CartItem.user_id == 1)),
+        ('cart guest expiry', select(CartItem.id).where(
+            CartItem.user_id.is_(None), CartItem.updated_at < '2000-01-01').limit(1000)),
+        ('orders recent', select(Order).order_by(Order.created_at.desc()).limit(20)),
+        ('order items by order', select(OrderItem).where(OrderItem.order_id == 1)),
+        ('login attempts', select(LoginAttempt).where(
+            LoginAttempt.ip_address == '127.0.0.1', LoginAttempt.username == 'admin')),
+    ]
+
+
+def explain_hot_queries(engine=None):
+    """Run EXPLAIN QUERY PLAN over :func:`hot_queries` (SQLite only).
+
+    Returns a list of (name, plan lines, problems). A query has problems when
+    it falls back to a full table scan or sorts through a temp b-tree.
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != 'sqlite':
+        return []
+
+    report = []
+    with engine.connect() as conn:
+        for name, stmt in hot_queries():
+            sql = str(stmt.compile(dialect=engine.dialect,
+                                   compile_kwargs={'literal_binds': True}))
+            plan = [row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+            problems = []
+            for line in plan:
+                if line.startswith('SCAN ') and ' USING ' not in line:
+                    problems.append(f'full scan of {line.split()[1]}')
+                elif 'USE TEMP B-TREE' in line:
+                    problems.append('sort not backed by an index')
+            report.append((name, plan, problems))
+    return report
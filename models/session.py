@@ -0,0 +1,51 @@
+"""
+ORM session that runs plain reads on a read-only engine.
+
+SELECTs issued by a session that has not written in its current transaction
+go to a reader: the engine chosen by the app's read router (replicas, with
+health checks and sticky-after-write, see apps/database.py), else the local
+``read`` bind. Everything else goes to the default (write) engine: flushes, DML, DDL,
+non-SELECT raw SQL and ``session.connection()``. Once a transaction has
+touched the writer it stays there until commit or rollback, so it always
+reads its own writes.
+"""
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.elements import TextClause
+
+READ_BIND = 'read'
+ROUTER_KEY = 'db_read_router'
+
+
+def _is_read(clause):
+    if clause is None or getattr(clause, 'is_dml', False):
+        return False
+    if getattr(clause, 'is_select', False):
+        return True
+    # Query.from_statement(text(...)) wraps the raw statement
+    clause = getattr(clause, 'element', clause)
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == 'SELECT'
+    return False
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get('on_writer') \
+                and _is_read(clause):
+            engines = self._db.engines
+            router = current_app.extensions.get(ROUTER_KEY) if has_app_context() else None
+            reader = router.reader(engines) if router else engines.get(READ_BIND)
+            if reader is not None:
+                return reader
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None:
+            self.info['on_writer'] = True
+        return engine
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _leave_writer(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('on_writer', None)
@@ -56,7 +56,9 @@ document.addEventListener('DOMContentLoaded', () => {
             `;
 
             try {
-                const url = categoryId ? `/api/products?category_id=${categoryId}` : '/api/products';
+                // Only the columns the card renders
+                const fields = 'fields=id,name,description,price,image';
+                const url = categoryId ? `/api/products?category_id=${categoryId}&${fields}` : `/api/products?${fields}`;
                 const response = await fetch(url);
                 const data = await response.json();
 
@@ -87,7 +89,7 @@ document.addEventListener('DOMContentLoaded', () => {
                             <div class="product-price" style="font-weight:700; color:var(--gray-900); font-size:16px; margin-bottom:16px;">
                                 ${priceFormatted}
                             </div>
-                            <button class="add-cart-btn btn-primary" style="width:100%; padding:10px; text-align:center; border:none; border-radius:8px; cursor:pointer;" onclick="event.preventDefault(); window.showToast('Added to cart');">Add to Cart</button>
+                            <button class="add-cart-btn btn-primary" style="width:100%; padding:10px; text-align:center; border:none; border-radius:8px; cursor:pointer;">Add to Cart</button>
                         </div>
                     `;
                     catalogGrid.appendChild(card);
@@ -118,9 +118,15 @@ document.addEventListener('DOMContentLoaded', () => {
             });
         }
 
-        state.cart.forEach(item => {
-            total += item.price * item.quantity;
-        });
+        // Server totals are authoritative once synced; demo cards without a
+        // server product keep the cart on local prices
+        if (serverSubtotal !== null && !state.cart.some(i => !isServerId(i.id))) {
+            total = serverSubtotal;
+        } else {
+            state.cart.forEach(item => {
+                total += item.price * item.quantity;
+            });
+        }
         const tax = total * 0.08; // 8% tax mock
         const finalTotal = total + tax;
 
@@ -142,20 +148,26 @@ document.addEventListener('DOMContentLoaded', () => {
         if (e.target.classList.contains('plus')) {
             const id = e.target.getAttribute('data-id');
             const item = state.cart.find(i => i.id === id);
-            if (item) item.quantity++;
+            if (item) {
+                item.quantity++;
+                queueOp(id, 'add', 1);
+            }
             renderCart();
         } else if (e.target.classList.contains('minus')) {
             const id = e.target.getAttribute('data-id');
             const item = state.cart.find(i => i.id === id);
             if (item && item.quantity > 1) {
                 item.quantity--;
+                queueOp(id, 'set', item.quantity);
             } else if (item && item.quantity === 1) {
                 state.cart = state.cart.filter(i => i.id !== id);
+                queueOp(id, 'set', 0);
             }
             renderCart();
         } else if (e.target.classList.contains('cart-item-remove')) {
             const id = e.target.getAttribute('data-id');
             state.cart = state.cart.filter(i => i.id !== id);
+            queueOp(id, 'set', 0);
             renderCart();
         }
     }
@@ -170,43 +182,136 @@ document.addEventListener('DOMContentLoaded', () => {
 
     window.cartClear = function () {
         state.cart = [];
+        pendingOps.clear();
+        serverSubtotal = null;
         renderCart();
     };
 
-    // Add to Cart
-    document.querySelectorAll('.add-cart-btn').forEach(btn => {
-        btn.addEventListener('click', (e) => {
-            const card = e.target.closest('.product-card');
-            if (!card) return;
-            const id = card.getAttribute('data-id');
-            const name = card.querySelector('.product-name').textContent;
-            const priceText = card.querySelector('.price-main').textContent;
-            const price = parseFloat(priceText.replace('$', '').replace(',', ''));
-            const imgTarget = card.querySelector('.product-img img');
-            const img = imgTarget ? imgTarget.src : 'https://via.placeholder.com/150';
-
-            const existing = state.cart.find(i => i.id === id);
-            if (existing) {
-                existing.quantity++;
-            } else {
-                state.cart.push({ id, name, price, img, quantity: 1 });
-            }
+    // --- Server Sync ---
+    // Clicks update the local cart at once and are sent to /api/cart/batch as
+    // one request per burst (folded per product); the server's cart and totals
+    // then replace the local copy. SYNC_DELAY_MS = 0 sends every click.
+    const SYNC_DELAY_MS = 400;
+    const pendingOps = new Map(); // product id -> { op: 'add' | 'set', quantity }
+    let syncTimer = null;
+    let syncing = null;
+    let serverSubtotal = null;
+
+    function isServerId(id) {
+        return /^\d+$/.test(String(id)); // static demo cards have no server product
+    }
 
-            if (window.showToast) window.showToast('Added to cart successfully!');
-            renderCart();
+    function queueOp(id, op, quantity) {
+        if (!isServerId(id)) return;
+        const prev = pendingOps.get(id);
+        if (op === 'add' && prev) {
+            pendingOps.set(id, { op: prev.op, quantity: prev.quantity + quantity });
+        } else {
+            pendingOps.set(id, { op, quantity });
+        }
+        serverSubtotal = null;
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(flushCart, SYNC_DELAY_MS);
+    }
 
-            // Visual feedback on button
-            const originalText = btn.innerHTML;
-            btn.classList.add('added');
-            btn.innerHTML = '✔ Added';
-            setTimeout(() => {
-                btn.classList.remove('added');
-                btn.innerHTML = originalText;
-            }, 2000);
-        });
+    function takeOps() {
+        const ops = [...pendingOps].map(([id, o]) => ({ op: o.op, product_id: Number(id), quantity: o.quantity }));
+        pendingOps.clear();
+        return ops;
+    }
+
+    function applyServerCart(data) {
+        if (pendingOps.size) return; // newer local changes; the next sync brings the server copy
+        const local = state.cart.filter(i => !isServerId(i.id));
+        state.cart = local.concat(data.items.filter(i => i.product).map(i => ({
+            id: String(i.product_id),
+            name: i.product.name,
+            price: i.unit_price !== null ? i.unit_price : i.product.price,
+            img: i.product.image || 'https://via.placeholder.com/150',
+            quantity: i.quantity,
+        })));
+        serverSubtotal = data.subtotal;
+        renderCart();
+    }
+
+    function loadCart() {
+        return fetch('/api/cart')
+            .then(r => r.json())
+            .then(data => { if (data.success) applyServerCart(data); })
+            .catch(err => console.error('Error loading cart:', err));
+    }
+
+    async function flushCart() {
+        clearTimeout(syncTimer);
+        while (syncing) await syncing; // keep batches in order
+        if (!pendingOps.size) return;
+        syncing = fetch('/api/cart/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ops: takeOps() }),
+        })
+            .then(r => r.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.message);
+                applyServerCart(data);
+            })
+            .catch(err => {
+                console.error('Cart sync failed:', err);
+                if (window.showToast) window.showToast('Could not update your cart.', 'error');
+                return loadCart();
+            })
+            .finally(() => { syncing = null; });
+        return syncing;
+    }
+    window.cartFlush = flushCart;
+
+    // Don't lose a pending burst when the tab is closed or hidden
+    window.addEventListener('pagehide', () => {
+        if (!pendingOps.size || !navigator.sendBeacon) return;
+        const body = new Blob([JSON.stringify({ ops: takeOps() })], { type: 'application/json' });
+        navigator.sendBeacon('/api/cart/batch', body);
+    });
+
+    // Add to Cart (delegated, so cards rendered later from the API work too)
+    document.addEventListener('click', (e) => {
+        const btn = e.target.closest('.add-cart-btn');
+        if (!btn) return;
+        const card = btn.closest('.product-card');
+        if (!card) return;
+        e.preventDefault();
+        const id = card.getAttribute('data-id');
+        const name = card.querySelector('.product-name').textContent;
+        const priceEl = card.querySelector('.price-main') || card.querySelector('.product-price');
+        const price = priceEl ? parseFloat(priceEl.textContent.replace(/[^\d.]/g, '')) || 0 : 0;
+        const imgTarget = card.querySelector('.product-img img');
+        const img = imgTarget ? imgTarget.src : 'https://via.placeholder.com/150';
+
+        const existing = state.cart.find(i => i.id === id);
+        if (existing) {
+            existing.quantity++;
+        } else {
+            state.cart.push({ id, name, price, img, quantity: 1 });
+        }
+        queueOp(id, 'add', 1);
+
+        if (window.showToast) window.showToast('Added to cart successfully!');
+        renderCart();
+
+        // Visual feedback on button
+        if (btn.classList.contains('added')) return;
+        const originalText = btn.innerHTML;
+        btn.classList.add('added');
+        btn.innerHTML = '✔ Added';
+        setTimeout(() => {
+            btn.classList.remove('added');
+            btn.innerHTML = originalText;
+        }, 2000);
     });
 
     renderCart(); // Initial init
+    // First load: the cart section of the page bootstrap (ui-config.js), else /api/cart
+    (window.pageBootstrap || Promise.resolve(null))
+        .then(data => (data && data.cart ? applyServerCart(data.cart) : loadCart()));
 
     // --- Checkout Validation & Formatting Logic ---
     const ccNumber = document.getElementById('cc-number');
@@ -283,9 +388,18 @@ document.addEventListener('DOMContentLoaded', () => {
         checkoutSubmitBtn.disabled = !isValid;
     }
 
+    // One key per checkout attempt: retries after a network error reuse it,
+    // so the server returns the original order instead of placing another.
+    let checkoutKey = null;
+
     // Submit handler
     window.submitCheckoutForm = async function () {
         if (checkoutSubmitBtn.disabled) return;
+        if (!checkoutKey) {
+            checkoutKey = (window.crypto && crypto.randomUUID)
+                ? crypto.randomUUID()
+                : Date.now().toString(36) + Math.random().toString(36).slice(2);
+        }
 
         // Change btn state to show loading
         const originalText = checkoutSubmitBtn.innerHTML;
@@ -293,9 +407,13 @@ document.addEventListener('DOMContentLoaded', () => {
         checkoutSubmitBtn.disabled = true;
 
         try {
+            await flushCart(); // checkout reads the server-side cart
             const response = await fetch('/api/checkout', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': checkoutKey,
+                },
                 body: JSON.stringify({
                     email: document.getElementById('checkout-email').value,
                     fname: document.getElementById('checkout-fname').value,
@@ -308,6 +426,7 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             if (response.ok) {
+                checkoutKey = null;
                 window.cartClear();
                 if (typeof window.switchPage === 'function') window.switchPage('order-confirmed');
             } else {
@@ -3,39 +3,27 @@
  * Fetches all UIAssets from /api/ui-config and applies them to
  * elements tagged with data-ui-key="key" attributes.
  * Falls back gracefully if API is unavailable.
+ *
+ * Caching is left to HTTP: the endpoint sends ETag + Cache-Control, so
+ * repeat loads are served from the browser cache or revalidated with a 304.
+ *
+ * When the page was rendered with inline initial state (#initial-state),
+ * the config is applied from it straight away, with no request at all.
+ *
+ * The rest of the first-load data (the visitor's cart, and the config when
+ * it was not inlined) comes from one /api/bootstrap request, exposed as
+ * window.pageBootstrap for the other scripts (cart.js).
  */
 (function () {
     'use strict';
 
-    const CACHE_KEY = 'em_ui_config';
-    const CACHE_TTL = 60 * 1000; // 1 minute
-
-    async function loadUIConfig() {
-        // Try sessionStorage cache first
-        try {
-            const cached = sessionStorage.getItem(CACHE_KEY);
-            if (cached) {
-                const { ts, data } = JSON.parse(cached);
-                if (Date.now() - ts < CACHE_TTL) {
-                    applyConfig(data);
-                    return;
-                }
-            }
-        } catch (e) { /* ignore */ }
-
+    async function loadUIConfig(revalidate) {
         try {
-            const res = await fetch('/api/ui-config');
+            const res = await fetch('/api/ui-config', {
+                cache: revalidate ? 'no-cache' : 'default',
+            });
             if (!res.ok) return;
             const config = await res.json();
-
-            // Cache it
-            try {
-                sessionStorage.setItem(CACHE_KEY, JSON.stringify({
-                    ts: Date.now(),
-                    data: config,
-                }));
-            } catch (e) { /* ignore quota errors */ }
-
             applyConfig(config);
         } catch (e) {
             // API unavailable — degrade gracefully, keep hardcoded text
@@ -70,14 +58,41 @@
 
     // Expose for manual refresh
     window.refreshUIConfig = function () {
-        sessionStorage.removeItem(CACHE_KEY);
-        loadUIConfig();
+        loadUIConfig(true);
     };
 
+    function readInitialState() {
+        const el = document.getElementById('initial-state');
+        if (!el) return null;
+        try {
+            return JSON.parse(el.textContent);
+        } catch (e) {
+            console.warn('[UI Config] Bad initial state:', e.message);
+            return null;
+        }
+    }
+
+    function init() {
+        const state = readInitialState();
+        const inlined = !!(state && state.ui_config);
+        if (inlined) applyConfig(state.ui_config);
+
+        const sections = inlined ? 'cart' : 'ui_config,cart';
+        window.pageBootstrap = fetch(`/api/bootstrap?include=${sections}`)
+            .then(res => (res.ok ? res.json() : null))
+            .catch(() => null);
+        if (!inlined) {
+            window.pageBootstrap.then(data => {
+                if (data && data.ui_config) applyConfig(data.ui_config);
+                else loadUIConfig(false);
+            });
+        }
+    }
+
     // Load on DOM ready
     if (document.readyState === 'loading') {
-        document.addEventListener('DOMContentLoaded', loadUIConfig);
+        document.addEventListener('DOMContentLoaded', init);
     } else {
-        loadUIConfig();
+        init();
     }
 })();